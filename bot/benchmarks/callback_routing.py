@@ -0,0 +1,119 @@
+"""
+Compares routing of callback queries through a chain of ``F.data`` filters
+(the way the admin menus were routed before) with the prefix-indexed
+``CallbackRouter``.
+
+Run from the bot directory: python -m benchmarks.callback_routing
+"""
+import asyncio
+from time import perf_counter
+
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+from utils.callback_data import (
+    AdminMenuCallback,
+    ConfirmUserDeletionCallback,
+    DeleteUserCallback,
+    UserCallback,
+    UserEditCallback,
+    UsersPageCallback,
+)
+from utils.callback_router import CallbackRouter
+
+ITERATIONS = 20000
+
+LEGACY_FILTERS = [
+    F.data == 'back:админ',
+    F.data == 'admin:создать',
+    F.data == 'admin:показать',
+    F.data == 'admin:заявки',
+    F.data == 'admin:все',
+    F.data.startswith('users_page-'),
+    F.data.startswith('user:'),
+    F.data.startswith('back:users_page-'),
+    F.data.startswith('user_edit:имя'),
+    F.data.startswith('user_edit:позывной'),
+    F.data.startswith('user_edit:возраст'),
+    F.data.startswith('user_edit:авто'),
+    F.data.startswith('user_edit:бронь'),
+    F.data.startswith('delete_user'),
+    F.data.startswith('confirm_user_deletion'),
+]
+
+LEGACY_DATA = [
+    'back:админ',
+    'users_page-alpha',
+    'user:123456789-alpha',
+    'user_edit:бронь:123456789',
+    'confirm_user_deletion:123456789-alpha',
+]
+
+INDEXED_DATA = [
+    AdminMenuCallback(action='menu').pack(),
+    UsersPageCallback(cursor='alpha').pack(),
+    UserCallback(telegram_id=123456789, cursor='alpha').pack(),
+    UserEditCallback(field='reserved', telegram_id=123456789).pack(),
+    ConfirmUserDeletionCallback(telegram_id=123456789, cursor='alpha').pack(),
+]
+
+
+async def legacy_handler(callback: CallbackQuery) -> None:
+    # The handlers re-parsed the data after the filter matched it.
+    callback.data.split(':', 1)[-1].split('-', 1)
+
+
+async def indexed_handler(callback: CallbackQuery, callback_data) -> None:
+    pass
+
+
+def legacy_dispatcher() -> Dispatcher:
+    dispatcher = Dispatcher()
+    router = Router()
+    for callback_filter in LEGACY_FILTERS:
+        router.callback_query.register(legacy_handler, callback_filter)
+    dispatcher.include_router(router)
+    return dispatcher
+
+
+def indexed_dispatcher() -> Dispatcher:
+    dispatcher = Dispatcher()
+    callbacks = CallbackRouter()
+    callbacks.register(AdminMenuCallback, action='menu')(indexed_handler)
+    for action in ('create', 'events', 'requests', 'users'):
+        callbacks.register(AdminMenuCallback, action=action)(indexed_handler)
+    for callback_data in (UsersPageCallback, UserCallback, DeleteUserCallback, ConfirmUserDeletionCallback):
+        callbacks.register(callback_data)(indexed_handler)
+    for field in ('name', 'callsign', 'age', 'car', 'reserved'):
+        callbacks.register(UserEditCallback, field=field)(indexed_handler)
+    callbacks.attach(dispatcher)
+    return dispatcher
+
+
+def make_update(update_id: int, data: str) -> Update:
+    user = User(id=1, is_bot=False, first_name='Bench')
+    message = Message(message_id=1, date=0, chat=Chat(id=1, type='private'), text='menu')
+    return Update(
+        update_id=update_id,
+        callback_query=CallbackQuery(id='1', from_user=user, chat_instance='1', message=message, data=data),
+    )
+
+
+async def measure(name: str, dispatcher: Dispatcher, data: list[str], bot: Bot) -> None:
+    updates = [make_update(number, data[number % len(data)]) for number in range(ITERATIONS)]
+    started = perf_counter()
+    for update in updates:
+        await dispatcher.feed_update(bot, update)
+    elapsed = perf_counter() - started
+    print(f'{name:>8}: {elapsed / ITERATIONS * 1e6:7.1f} us per callback')
+
+
+async def main() -> None:
+    bot = Bot('0:benchmark')
+    await measure('filters', legacy_dispatcher(), LEGACY_DATA, bot)
+    await measure('indexed', indexed_dispatcher(), INDEXED_DATA, bot)
+    await bot.session.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
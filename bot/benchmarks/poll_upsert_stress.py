@@ -0,0 +1,126 @@
+"""
+Fires thousands of simultaneous poll answers at one event and checks that
+every user ends up with exactly one answer and that the incrementally
+updated event summary matches a recount.
+
+The answers are sent from several processes at once (like the webhook
+shards) against a temporary SQLite database with the bot's pragmas.
+
+Run from the bot directory: python -m benchmarks.poll_upsert_stress
+"""
+import asyncio
+import os
+import random
+import tempfile
+from datetime import timedelta
+from multiprocessing import get_context
+from time import perf_counter
+
+from tortoise import Tortoise, timezone
+
+from database.config import build_connection
+from database.models import Event, Poll, User
+from database.polls_db_manager import SUMMARY_FIELDS, get_event_summary, poll_save, rebuild_event_summary
+
+USERS = 300
+ANSWERS = 6000
+PROCESSES = 4
+
+
+def orm_config(db_path: str) -> dict:
+    return {
+        'connections': {'default': build_connection(f'sqlite://{db_path}')},
+        'apps': {'models': {'models': ['database.models'], 'default_connections': 'default'}},
+    }
+
+
+def random_answer() -> dict:
+    if random.random() < 0.3:
+        return {'is_attending': False, 'reason_not_attending': 'Работа'}
+    driver = random.random() < 0.3
+    return {
+        'is_attending': True,
+        'can_provide_ride': driver,
+        'car_capacity': random.randint(1, 4) if driver else None,
+    }
+
+
+async def answer(db_path: str, user_ids: list[int], event_id: int, count: int, seed: int) -> int:
+    random.seed(seed)
+    await Tortoise.init(config=orm_config(db_path))
+    # Open the connection first, concurrent transactions on a client that
+    # is not connected yet would each open their own.
+    await Tortoise.get_connection('default').execute_query('SELECT 1')
+    try:
+        results = await asyncio.gather(
+            *(poll_save(random.choice(user_ids), event_id, **random_answer()) for _ in range(count)),
+            return_exceptions=True,
+        )
+    finally:
+        await Tortoise.close_connections()
+    errors = [result for result in results if isinstance(result, Exception)]
+    for error in errors[:3]:
+        print(f'  {type(error).__name__}: {error}')
+    return len(errors)
+
+
+def run_worker(db_path: str, user_ids: list[int], event_id: int, count: int, seed: int) -> int:
+    return asyncio.run(answer(db_path, user_ids, event_id, count, seed))
+
+
+async def prepare(db_path: str) -> tuple[list[int], int]:
+    await Tortoise.init(config=orm_config(db_path))
+    await Tortoise.generate_schemas()
+    await User.bulk_create([User(telegram_id=number, approved=True) for number in range(USERS)])
+    user_ids = await User.all().values_list('id', flat=True)
+    event = await Event.create(
+        event_name='Stress',
+        organization='Benchmark',
+        price=0,
+        latitude=55.75,
+        longitude=37.62,
+        expire=timezone.now() + timedelta(days=1),
+    )
+    await Tortoise.close_connections()
+    return user_ids, event.id
+
+
+async def verify(db_path: str, event_id: int) -> None:
+    await Tortoise.init(config=orm_config(db_path))
+    polls = await Poll.filter(event_id=event_id).count()
+    answered = len(await Poll.filter(event_id=event_id).distinct().values_list('user_id', flat=True))
+    summary = await get_event_summary(event_id)
+    incremental = {field: getattr(summary, field) for field in SUMMARY_FIELDS}
+    recounted = await rebuild_event_summary(event_id)
+    await Tortoise.close_connections()
+
+    print(f'poll rows: {polls}, users answered: {answered}')
+    print(f'summary:   {incremental}')
+    print(f'recount:   {dict((field, getattr(recounted, field)) for field in SUMMARY_FIELDS)}')
+    ok = polls == answered and all(getattr(recounted, field) == value for field, value in incremental.items())
+    print('OK' if ok else 'MISMATCH')
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, 'stress.sqlite3')
+        user_ids, event_id = asyncio.run(prepare(db_path))
+
+        per_process = ANSWERS // PROCESSES
+        started = perf_counter()
+        with get_context('spawn').Pool(PROCESSES) as pool:
+            errors = pool.starmap(
+                run_worker,
+                [(db_path, user_ids, event_id, per_process, seed) for seed in range(PROCESSES)],
+            )
+        elapsed = perf_counter() - started
+        total = per_process * PROCESSES
+        print(
+            f'{total} answers from {PROCESSES} processes in {elapsed:.2f} s '
+            f'({total / elapsed:.0f}/s), errors: {sum(errors)}'
+        )
+        asyncio.run(verify(db_path, event_id))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Measures matching passengers with drivers for events of a few hundred
+attendees: the NumPy distance matrix and the greedy assignment.
+
+Run from the bot directory: python -m benchmarks.ride_matching
+"""
+import random
+from time import perf_counter
+
+from utils.ride_matcher import match_rides
+
+ITERATIONS = 20
+SIZES = (100, 300, 600, 1000)
+DRIVERS_SHARE = 0.25
+
+# Around Moscow, roughly 60 x 60 km.
+LATITUDE, LONGITUDE, SPREAD = 55.75, 37.62, 0.3
+
+
+def make_polls(attendees: int) -> list[dict]:
+    random.seed(attendees)
+    polls = []
+    for user_id in range(attendees):
+        driver = random.random() < DRIVERS_SHARE
+        polls.append({
+            'user_id': user_id,
+            'can_provide_ride': driver,
+            'car_capacity': random.randint(1, 4) if driver else None,
+            'start_location': f'{LATITUDE + random.uniform(-SPREAD, SPREAD):.5f},'
+                              f'{LONGITUDE + random.uniform(-SPREAD, SPREAD):.5f}',
+        })
+    return polls
+
+
+def main() -> None:
+    for attendees in SIZES:
+        polls = make_polls(attendees)
+        started = perf_counter()
+        for _ in range(ITERATIONS):
+            match = match_rides(polls)
+        elapsed = (perf_counter() - started) / ITERATIONS
+        print(
+            f'{attendees:>5} attendees: {elapsed * 1000:7.2f} ms, '
+            f'{match.drivers} drivers, {len(match.rides)} of {match.passengers} passengers matched'
+        )
+
+
+if __name__ == '__main__':
+    main()
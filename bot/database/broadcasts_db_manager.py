@@ -0,0 +1,151 @@
+from typing import Any, Callable
+
+from tortoise import timezone
+from tortoise.expressions import F, Q, Subquery
+from tortoise.functions import Count
+from tortoise.transactions import in_transaction
+
+from database.models import Broadcast, BroadcastRecipient, Poll, User
+
+
+def _members() -> Q:
+    return Q(approved=True) & (Q(reserved=False) | Q(reserved__isnull=True))
+
+
+def _no_answer(event_id: str) -> Q:
+    # NOT IN over the polls of the event: one anti-join instead of a query per member.
+    answered = Poll.filter(event_id=int(event_id)).values('user_id')
+    return _members() & ~Q(id__in=Subquery(answered))
+
+
+# Filters selecting the recipients of a broadcast by its audience, an
+# audience may carry an argument after a colon, e.g. "no_answer:<event id>".
+AUDIENCES: dict[str, Callable[..., Q]] = {
+    'members': _members,
+    'no_answer': _no_answer,
+}
+
+
+def audience_filter(audience: str) -> Q:
+    name, _, argument = audience.partition(':')
+    return AUDIENCES[name](argument) if argument else AUDIENCES[name]()
+
+
+UNFINISHED_STATUSES = ('pending', 'running')
+
+
+async def broadcast_get_or_create(
+        key: str,
+        text: str,
+        audience: str = 'members',
+        created_by: int | None = None,
+) -> tuple[Broadcast, bool]:
+    """
+    Returns the broadcast with the key, creating it if it does not exist yet.
+
+    The key makes starting a broadcast idempotent, e.g. ``event:<id>:announce``.
+    """
+    if audience.partition(':')[0] not in AUDIENCES:
+        raise ValueError(f'Unknown broadcast audience "{audience}"')
+    return await Broadcast.get_or_create(
+        key=key,
+        defaults={'text': text, 'audience': audience, 'created_by': created_by},
+    )
+
+
+async def get_unfinished_broadcasts() -> list[Broadcast]:
+    return await Broadcast.filter(status__in=UNFINISHED_STATUSES).order_by('id')
+
+
+async def broadcast_start(broadcast: Broadcast) -> None:
+    broadcast.status = 'running'
+    if broadcast.started_at is None:
+        broadcast.started_at = timezone.now()
+    await broadcast.save(update_fields=['status', 'started_at'])
+
+
+async def get_recipients_batch(broadcast: Broadcast, limit: int) -> list[dict[str, Any]]:
+    """
+    Returns the next recipients after the broadcast cursor, ordered by user id.
+    """
+    return await (
+        User.filter(audience_filter(broadcast.audience), id__gt=broadcast.cursor)
+        .order_by('id')
+        .limit(limit)
+        .values('id', 'telegram_id')
+    )
+
+
+async def get_recorded_user_ids(broadcast: Broadcast, user_ids: list[int]) -> set[int]:
+    """
+    Returns the users of the batch the broadcast was already sent to before a restart.
+    """
+    return set(
+        await BroadcastRecipient.filter(
+            broadcast_id=broadcast.id,
+            user_id__in=user_ids,
+        ).values_list('user_id', flat=True)
+    )
+
+
+async def broadcast_record_recipient(broadcast: Broadcast, user_id: int, status: str) -> None:
+    await BroadcastRecipient.create(
+        broadcast_id=broadcast.id,
+        user_id=user_id,
+        status=status,
+        sent_at=timezone.now(),
+    )
+
+
+async def broadcast_advance(broadcast: Broadcast, cursor: int, counters: dict[str, int]) -> None:
+    """
+    Moves the cursor past a finished batch and adds the batch results to the counters.
+    """
+    broadcast.cursor = cursor
+    for status, count in counters.items():
+        setattr(broadcast, status, getattr(broadcast, status) + count)
+    await Broadcast.filter(id=broadcast.id).update(
+        cursor=cursor,
+        **{status: F(status) + count for status, count in counters.items()},
+    )
+
+
+async def broadcast_counters(broadcast: Broadcast) -> dict[str, int]:
+    counters = {'sent': 0, 'failed': 0, 'blocked': 0}
+    rows = await (
+        BroadcastRecipient.filter(broadcast_id=broadcast.id)
+        .annotate(count=Count('id'))
+        .group_by('status')
+        .values('status', 'count')
+    )
+    for row in rows:
+        counters[row['status']] = row['count']
+    return counters
+
+
+async def broadcast_finish(broadcast: Broadcast) -> None:
+    """
+    Marks the broadcast as done with counters recounted from the recipients table,
+    which also covers recipients sent in a batch interrupted by a restart.
+    """
+    async with in_transaction():
+        counters = await broadcast_counters(broadcast)
+        broadcast.sent = counters['sent']
+        broadcast.failed = counters['failed']
+        broadcast.blocked = counters['blocked']
+        broadcast.status = 'done'
+        broadcast.finished_at = timezone.now()
+        await broadcast.save(
+            update_fields=['sent', 'failed', 'blocked', 'status', 'finished_at']
+        )
+
+
+async def broadcast_fail(broadcast: Broadcast) -> None:
+    """
+    Marks a broadcast stopped by an unexpected error as failed, it is not resumed on startup.
+
+    Starting it again with the same key continues from its cursor.
+    """
+    broadcast.status = 'failed'
+    broadcast.finished_at = timezone.now()
+    await broadcast.save(update_fields=['status', 'finished_at'])
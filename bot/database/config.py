@@ -1,7 +1,50 @@
-from settings.settings import DATABASE_URL
+from tortoise.backends.base.config_generator import expand_db_url
+
+from settings.settings import (
+    DATABASE_URL,
+    SQLITE_BUSY_TIMEOUT,
+    SQLITE_JOURNAL_MODE,
+    SQLITE_SYNCHRONOUS,
+    SQLITE_MMAP_SIZE,
+    SQLITE_CACHE_SIZE,
+    SQLITE_TEMP_STORE,
+)
+
+# Applied by the Tortoise SQLite client as "PRAGMA key=value" on every new
+# connection, in this order. busy_timeout goes first so that switching the
+# journal mode waits for a lock instead of failing right away.
+SQLITE_PRAGMAS = {
+    'busy_timeout': SQLITE_BUSY_TIMEOUT,
+    'journal_mode': SQLITE_JOURNAL_MODE,
+    'synchronous': SQLITE_SYNCHRONOUS,
+    'mmap_size': SQLITE_MMAP_SIZE,
+    'cache_size': SQLITE_CACHE_SIZE,
+    'temp_store': SQLITE_TEMP_STORE,
+}
+
+
+def build_connection(db_url: str | None) -> str | dict | None:
+    """
+    Expands a SQLite database URL into a connection config with the performance pragmas.
+
+    Other database URLs are returned unchanged.
+
+    :param db_url: Database URL from the settings.
+    """
+    if not db_url or not db_url.startswith('sqlite://'):
+        return db_url
+
+    connection = expand_db_url(db_url)
+    credentials = connection['credentials']
+    connection['credentials'] = {
+        **SQLITE_PRAGMAS,
+        **{key: value for key, value in credentials.items() if key not in SQLITE_PRAGMAS},
+    }
+    return connection
+
 
 TORTOISE_ORM = {
-    'connections': {'default': DATABASE_URL},
+    'connections': {'default': build_connection(DATABASE_URL)},
     'apps': {
         'models': {
             'models': ['database.models', 'aerich.models'],
@@ -0,0 +1,96 @@
+from datetime import timedelta
+from typing import Any
+
+from tortoise import timezone
+from tortoise.transactions import in_transaction
+
+from database.jobs_db_manager import jobs_cancel, jobs_upsert
+from database.models import Event, ScheduledJob
+from settings.settings import REMINDER_OFFSETS
+from utils.job_scheduler import wake_scheduler
+
+EVENT_UPDATABLE_FIELDS = Event._meta.db_fields - {'id'}
+
+
+def event_jobs(event: Event) -> tuple[list[ScheduledJob], list[str]]:
+    """
+    Returns the jobs an event needs and the keys of its jobs that are not needed anymore.
+
+    Jobs are keyed by the event, so saving the event again moves them.
+    Reminders that would already be late are dropped, an event created
+    an hour before its poll closes does not get the 24 hours reminder.
+    """
+    jobs = [
+        ScheduledJob(
+            key=f'event:{event.id}:close_poll',
+            kind='close_poll',
+            event_id=event.id,
+            run_at=event.expire,
+        ),
+    ]
+    cancelled = []
+    now = timezone.now()
+    for hours in REMINDER_OFFSETS:
+        key = f'event:{event.id}:remind:{hours:g}h'
+        run_at = event.expire - timedelta(hours=hours)
+        if run_at <= now:
+            cancelled.append(key)
+            continue
+        jobs.append(ScheduledJob(key=key, kind='remind', event_id=event.id, run_at=run_at))
+    return jobs, cancelled
+
+
+async def _schedule_event_jobs(event: Event) -> None:
+    jobs, cancelled = event_jobs(event)
+    await jobs_upsert(jobs)
+    if cancelled:
+        await jobs_cancel(cancelled)
+
+
+async def event_create(**kwargs) -> Event:
+    """
+    Creates the event with its jobs, including the announcement to the members.
+
+    The announcement is a job saved in the same transaction, so it is sent
+    even if the bot stops right after the event is created. It is created
+    here only, rescheduling an event does not announce it again.
+    """
+    async with in_transaction():
+        event = await Event.create(**kwargs)
+        await _schedule_event_jobs(event)
+        await jobs_upsert([
+            ScheduledJob(
+                key=f'event:{event.id}:announce',
+                kind='announce',
+                event_id=event.id,
+                run_at=timezone.now(),
+            ),
+        ])
+    wake_scheduler()
+    return event
+
+
+async def event_update(event_id: int, **kwargs) -> int:
+    """
+    Updates the given columns and reschedules the jobs of the event.
+
+    Returns the number of updated rows, so 0 means that the event does not exist.
+    """
+    fields: dict[str, Any] = {key: value for key, value in kwargs.items() if key in EVENT_UPDATABLE_FIELDS}
+    if not fields:
+        return 0
+
+    async with in_transaction():
+        updated = await Event.filter(id=event_id).update(**fields)
+        if updated and 'expire' in fields:
+            event = await Event.get(id=event_id)
+            await _schedule_event_jobs(event)
+    if updated and 'expire' in fields:
+        wake_scheduler()
+    return updated
+
+
+async def event_delete(event_id: int) -> None:
+    # The jobs of the event are deleted by the cascade, the scheduler
+    # skips them when they come due.
+    await Event.filter(id=event_id).delete()
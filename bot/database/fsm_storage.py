@@ -0,0 +1,185 @@
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from tortoise import timezone
+from tortoise.transactions import in_transaction
+
+from database.models import FSMRecord
+from utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, date):
+        return {'__date__': value.isoformat()}
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def _json_object_hook(value: dict) -> Any:
+    if '__datetime__' in value:
+        return datetime.fromisoformat(value['__datetime__'])
+    if '__date__' in value:
+        return date.fromisoformat(value['__date__'])
+    return value
+
+
+def dump_data(data: Dict[str, Any]) -> str:
+    return json.dumps(data, default=_json_default, ensure_ascii=False)
+
+
+def load_data(raw: str) -> Dict[str, Any]:
+    return json.loads(raw, object_hook=_json_object_hook)
+
+
+@dataclass
+class FSMSession:
+    state: Optional[str] = None
+    data: Dict[str, Any] = field(default_factory=dict)
+    # ``updated_at`` of the stored row, None for a session without a row.
+    saved_at: Optional[datetime] = None
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    FSM storage that keeps states and data in the bot's SQLite database.
+
+    Reads are served from an LRU cache of hot sessions. Writes only change
+    the cached session and mark it dirty; ``flush()`` persists all dirty
+    sessions with a single upsert (and a single delete for cleared
+    sessions) in one transaction. ``FSMStorageFlushMiddleware`` calls it
+    after every update, so a handler that calls ``set_state`` and
+    ``update_data`` several times costs one write. Sessions idle for longer
+    than ``ttl`` are treated as empty and purged from the table. Reads
+    count as activity too: a session read more than ``purge_interval``
+    after it was saved is marked dirty, so the next flush refreshes its
+    ``updated_at`` and a user who only reads the state does not expire.
+
+    Attributes:
+        key_builder (KeyBuilder): Builds the string key of a session.
+        ttl (timedelta): Idle time after which a session expires.
+        purge_interval (timedelta): Minimal time between two purges of expired rows.
+    """
+
+    def __init__(
+            self,
+            key_builder: KeyBuilder | None = None,
+            cache_size: int = 1024,
+            ttl: int = 7 * 24 * 60 * 60,
+            purge_interval: int = 60 * 60,
+    ):
+        """
+        Initializes the storage.
+
+        :param key_builder: Builds the string key of a session, ``DefaultKeyBuilder`` by default.
+        :param cache_size: Maximum number of sessions kept in memory.
+        :param ttl: Idle time in seconds after which a session expires.
+        :param purge_interval: Minimal time in seconds between two purges of expired rows.
+        """
+        self.key_builder = key_builder or DefaultKeyBuilder()
+        self.ttl = timedelta(seconds=ttl)
+        self.purge_interval = timedelta(seconds=purge_interval)
+        self._cache = LRUCache(maxsize=cache_size, ttl=ttl)
+        self._dirty: dict[str, FSMSession] = {}
+        self._last_purge: datetime | None = None
+
+    async def _session(self, key: StorageKey) -> tuple[str, FSMSession]:
+        storage_key = self.key_builder.build(key)
+        session = self._dirty.get(storage_key) or self._cache.get(storage_key)
+        if session is None:
+            session = FSMSession()
+            record = await FSMRecord.get_or_none(key=storage_key)
+            if record is not None and record.updated_at > timezone.now() - self.ttl:
+                session = FSMSession(state=record.state, data=load_data(record.data), saved_at=record.updated_at)
+            self._cache.set(storage_key, session)
+        return storage_key, session
+
+    def _touch(self, storage_key: str, session: FSMSession) -> None:
+        if session.saved_at is not None and timezone.now() - session.saved_at > self.purge_interval:
+            self._dirty.setdefault(storage_key, session)
+
+    def _mark_dirty(self, storage_key: str, session: FSMSession) -> None:
+        self._dirty[storage_key] = session
+        self._cache.set(storage_key, session)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key, session = await self._session(key)
+        session.state = state.state if isinstance(state, State) else state
+        self._mark_dirty(storage_key, session)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        storage_key, session = await self._session(key)
+        self._touch(storage_key, session)
+        return session.state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        storage_key, session = await self._session(key)
+        session.data = data.copy()
+        self._mark_dirty(storage_key, session)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        storage_key, session = await self._session(key)
+        self._touch(storage_key, session)
+        return session.data.copy()
+
+    async def flush(self, keys: Iterable[StorageKey] | None = None) -> None:
+        """
+        Persists the sessions changed since the previous flush in one transaction.
+
+        :param keys: Sessions to persist, all changed sessions by default. Updates of
+            different chats are handled concurrently, so the flush after an update is
+            limited to its own session and never writes a half-done change of another one.
+        """
+        if keys is None:
+            dirty, self._dirty = self._dirty, {}
+        else:
+            storage_keys = {self.key_builder.build(key) for key in keys}
+            dirty = {key: self._dirty.pop(key) for key in storage_keys if key in self._dirty}
+        if not dirty:
+            return
+
+        now = timezone.now()
+        records = [
+            FSMRecord(key=key, state=session.state, data=dump_data(session.data), updated_at=now)
+            for key, session in dirty.items()
+            if session.state is not None or session.data
+        ]
+        cleared = [
+            key for key, session in dirty.items()
+            if session.state is None and not session.data
+        ]
+
+        try:
+            async with in_transaction():
+                if records:
+                    await FSMRecord.bulk_create(
+                        records,
+                        on_conflict=['key'],
+                        update_fields=['state', 'data', 'updated_at'],
+                    )
+                if cleared:
+                    await FSMRecord.filter(key__in=cleared).delete()
+        except Exception:
+            # Keep the changes so that the next flush retries them,
+            # unless the session was changed again in the meantime.
+            for key, session in dirty.items():
+                self._dirty.setdefault(key, session)
+            raise
+        for key, session in dirty.items():
+            session.saved_at = now if key not in cleared else None
+
+        if self._last_purge is None or now - self._last_purge > self.purge_interval:
+            self._last_purge = now
+            purged = await FSMRecord.filter(updated_at__lt=now - self.ttl).delete()
+            if purged:
+                logger.info('Purged %d expired FSM sessions', purged)
+
+    async def close(self) -> None:
+        await self.flush()
@@ -1,6 +1,139 @@
+import hashlib
+import logging
+
 from tortoise import Tortoise, run_async
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.transactions import in_transaction
+from tortoise.utils import get_schema_sql
 
 from database import config
+from database.polls_db_manager import rebuild_event_summary
+from utils.timing import startup_phase
+
+logger = logging.getLogger(__name__)
+
+
+async def log_sqlite_pragmas() -> None:
+    """
+    Logs the pragmas that are actually in effect on the default SQLite connection.
+
+    SQLite silently ignores unsupported values (e.g. WAL on an in-memory
+    database), so the values are read back instead of echoing the settings.
+    """
+    connection = Tortoise.get_connection('default')
+    if connection.capabilities.dialect != 'sqlite':
+        return
+
+    effective = {}
+    for pragma in config.SQLITE_PRAGMAS:
+        _, rows = await connection.execute_query(f'PRAGMA {pragma}')
+        effective[pragma] = rows[0][0] if rows else None
+
+    logger.info(
+        'SQLite pragmas: %s',
+        ', '.join(f'{pragma}={value}' for pragma, value in effective.items())
+    )
+
+
+def schema_version(connection: BaseDBAsyncClient) -> int:
+    """
+    Returns a positive 31-bit fingerprint of the DDL generated for the current models.
+
+    :param connection: Connection the schema is generated for.
+    """
+    schema = get_schema_sql(connection, safe=True)
+    digest = hashlib.sha256(schema.encode()).digest()
+    return int.from_bytes(digest[:4], 'big') & 0x7FFFFFFF or 1
+
+
+async def ensure_poll_unique_index() -> None:
+    """
+    Adds the unique (user_id, event_id) index to a polls table created before it was declared.
+
+    ``generate_schemas`` does not alter existing tables, so duplicated
+    answers (the latest one is kept) are deleted first, the index is
+    created with ``IF NOT EXISTS`` and the summaries of the affected
+    events are recounted. A table that already has the constraint is left
+    untouched, so running it again is harmless. SQLite only.
+    """
+    connection = Tortoise.get_connection('default')
+    if connection.capabilities.dialect != 'sqlite':
+        return
+
+    _, indexes = await connection.execute_query("PRAGMA index_list('polls')")
+    for index in indexes:
+        if not index['unique']:
+            continue
+        _, columns = await connection.execute_query(f"PRAGMA index_info('{index['name']}')")
+        if {column['name'] for column in columns} == {'user_id', 'event_id'}:
+            return
+
+    duplicates = 'SELECT MAX("id") FROM "polls" GROUP BY "user_id", "event_id"'
+    _, rows = await connection.execute_query(
+        f'SELECT DISTINCT "event_id" FROM "polls" WHERE "id" NOT IN ({duplicates})'
+    )
+    async with in_transaction() as transaction:
+        deleted, _ = await transaction.execute_query(f'DELETE FROM "polls" WHERE "id" NOT IN ({duplicates})')
+        await transaction.execute_script(
+            'CREATE UNIQUE INDEX IF NOT EXISTS "uidx_polls_user_event" ON "polls" ("user_id", "event_id")'
+        )
+    for row in rows:
+        await rebuild_event_summary(row['event_id'])
+    logger.info('Unique poll index created, %d duplicated answers deleted', deleted)
+
+
+async def missing_columns() -> dict[str, set[str]]:
+    """
+    Returns the columns of the models that the existing tables do not have, by table.
+
+    ``generate_schemas`` only creates missing tables, a table created by an
+    older version of a model keeps its old columns. SQLite only.
+    """
+    connection = Tortoise.get_connection('default')
+    missing = {}
+    for app in Tortoise.apps.values():
+        for model in app.values():
+            table = model._meta.db_table
+            _, rows = await connection.execute_query(f"PRAGMA table_info('{table}')")
+            columns = set(model._meta.fields_db_projection.values()) - {row['name'] for row in rows}
+            if columns:
+                missing[table] = columns
+    return missing
+
+
+async def generate_schemas_if_changed() -> None:
+    """
+    Runs ``Tortoise.generate_schemas()`` only when the models changed since the last run.
+
+    For SQLite the fingerprint of the generated DDL is kept in the
+    database header (``PRAGMA user_version``), so an up to date database
+    costs one pragma read on boot instead of a full DDL pass. Existing
+    tables are not altered, so the version is stamped only when they have
+    every column of the models. Other backends always generate schemas.
+    """
+    connection = Tortoise.get_connection('default')
+    if connection.capabilities.dialect != 'sqlite':
+        await Tortoise.generate_schemas()
+        return
+
+    version = schema_version(connection)
+    _, rows = await connection.execute_query('PRAGMA user_version')
+    if rows and rows[0][0] == version:
+        logger.info('Database schema is up to date (version %d)', version)
+        return
+
+    await Tortoise.generate_schemas()
+    await ensure_poll_unique_index()
+    missing = await missing_columns()
+    if missing:
+        # Not stamped, so the check runs again on every boot until the tables are migrated.
+        logger.warning(
+            'Database tables do not match the models, migrate them by hand: %s',
+            '; '.join(f'{table} lacks {", ".join(sorted(columns))}' for table, columns in missing.items())
+        )
+        return
+    await connection.execute_script(f'PRAGMA user_version = {version}')
+    logger.info('Database schema generated (version %d)', version)
 
 
 async def init() -> None:
@@ -9,19 +142,21 @@ async def init() -> None:
 
     Note:
         This function initializes Tortoise ORM
-        with the provided database URL and modules,
-        and generates the database schemas.
+        with the connection config from ``database.config``
+        (SQLite performance pragmas included),
+        and generates the database schemas
+        if the models changed since the previous start.
 
     Raises:
         tortoise.exceptions.ConfigurationError:
         If there's a configuration error.
     """
-    await Tortoise.init(
-        db_url=config.DATABASE_URL,
-        modules={'models': ['database.models', 'aerich.models']}
-    )
+    with startup_phase('ORM init'):
+        await Tortoise.init(config=config.TORTOISE_ORM)
+        await log_sqlite_pragmas()
 
-    await Tortoise.generate_schemas()
+    with startup_phase('schema check'):
+        await generate_schemas_if_changed()
 
 if __name__ == '__main__':
     """
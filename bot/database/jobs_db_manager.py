@@ -0,0 +1,79 @@
+from datetime import datetime
+from time import time_ns
+
+from tortoise import timezone
+
+from database.models import ScheduledJob
+
+
+async def jobs_upsert(jobs: list[ScheduledJob]) -> None:
+    """
+    Creates the jobs or moves the existing ones with the same key, moved jobs are pending again.
+
+    Every save gets a new ``revision``, the updates of a run job are
+    applied only if the job was not saved again meanwhile. (Comparing
+    ``updated_at`` would not do: Tortoise formats datetimes in UPDATE
+    filters differently from the stored values on SQLite.)
+    """
+    if not jobs:
+        return
+    now = timezone.now()
+    revision = time_ns()
+    for job in jobs:
+        job.revision = revision
+        job.status = 'pending'
+        job.attempts = 0
+        job.last_error = None
+        job.updated_at = now
+    await ScheduledJob.bulk_create(
+        jobs,
+        on_conflict=['key'],
+        update_fields=['kind', 'event_id', 'run_at', 'status', 'attempts', 'last_error', 'revision', 'updated_at'],
+    )
+
+
+async def jobs_cancel(keys: list[str]) -> None:
+    await ScheduledJob.filter(key__in=keys, status='pending').update(
+        status='cancelled',
+        revision=time_ns(),
+        updated_at=timezone.now(),
+    )
+
+
+async def jobs_pending() -> list[ScheduledJob]:
+    return await ScheduledJob.filter(status='pending').order_by('run_at')
+
+
+async def jobs_changed_since(since: datetime) -> list[ScheduledJob]:
+    return await ScheduledJob.filter(updated_at__gte=since).order_by('updated_at')
+
+
+async def job_complete(job: ScheduledJob) -> None:
+    await ScheduledJob.filter(id=job.id, revision=job.revision).update(
+        status='done',
+        finished_at=timezone.now(),
+    )
+
+
+async def job_retry(job: ScheduledJob) -> None:
+    """
+    Saves the new ``run_at``, ``attempts`` and ``last_error`` of a failed job.
+    """
+    await ScheduledJob.filter(id=job.id, revision=job.revision).update(
+        run_at=job.run_at,
+        attempts=job.attempts,
+        last_error=job.last_error,
+    )
+
+
+async def job_fail(job: ScheduledJob) -> None:
+    await ScheduledJob.filter(id=job.id, revision=job.revision).update(
+        status='failed',
+        attempts=job.attempts,
+        last_error=job.last_error,
+        finished_at=timezone.now(),
+    )
+
+
+async def job_get_pending(job_id: int) -> ScheduledJob | None:
+    return await ScheduledJob.get_or_none(id=job_id, status='pending').prefetch_related('event')
@@ -57,6 +57,23 @@ class Poll(Model):
 
     class Meta:
         table = "polls"
+        unique_together = (("user", "event"),)
+
+
+class EventSummary(Model):
+    event = fields.OneToOneField(
+        "models.Event",
+        related_name="summary",
+        on_delete=fields.CASCADE,
+        pk=True
+    )
+    attending = fields.IntField(default=0)
+    not_attending = fields.IntField(default=0)
+    drivers = fields.IntField(default=0)
+    seats = fields.IntField(default=0)
+
+    class Meta:
+        table = "event_summaries"
 
 
 class RideShare(Model):
@@ -79,3 +96,118 @@ class RideShare(Model):
 
     class Meta:
         table = "ride_shares"
+
+
+class FSMRecord(Model):
+    key = fields.CharField(max_length=255, pk=True)
+    state = fields.CharField(max_length=255, null=True, default=None)
+    data = fields.TextField(default='{}')
+    updated_at = fields.DatetimeField(index=True)
+
+    class Meta:
+        table = "fsm_storage"
+
+
+class Broadcast(Model):
+    id = fields.IntField(pk=True)
+    key = fields.CharField(max_length=255, unique=True)
+    text = fields.TextField()
+    audience = fields.CharField(max_length=32, default='members')
+    status = fields.CharField(max_length=16, default='pending', index=True)
+    cursor = fields.IntField(default=0)
+    sent = fields.IntField(default=0)
+    failed = fields.IntField(default=0)
+    blocked = fields.IntField(default=0)
+    created_by = fields.BigIntField(null=True, default=None)
+    created_at = fields.DatetimeField(auto_now_add=True)
+    started_at = fields.DatetimeField(null=True, default=None)
+    finished_at = fields.DatetimeField(null=True, default=None)
+
+    class Meta:
+        table = "broadcasts"
+
+
+class BroadcastRecipient(Model):
+    id = fields.IntField(pk=True)
+    broadcast = fields.ForeignKeyField(
+        "models.Broadcast",
+        related_name="recipients",
+        on_delete=fields.CASCADE
+    )
+    user = fields.ForeignKeyField(
+        "models.User",
+        related_name="broadcasts",
+        on_delete=fields.CASCADE
+    )
+    status = fields.CharField(max_length=16)
+    sent_at = fields.DatetimeField()
+
+    class Meta:
+        table = "broadcast_recipients"
+        unique_together = (("broadcast", "user"),)
+
+
+class OutboxMessage(Model):
+    id = fields.IntField(pk=True)
+    dedup_key = fields.CharField(max_length=255, unique=True)
+    chat_id = fields.BigIntField()
+    text = fields.TextField()
+    reply_markup = fields.TextField(null=True, default=None)
+    status = fields.CharField(max_length=16, default='pending')
+    attempts = fields.IntField(default=0)
+    next_attempt_at = fields.DatetimeField()
+    last_error = fields.TextField(null=True, default=None)
+    created_at = fields.DatetimeField(auto_now_add=True)
+    sent_at = fields.DatetimeField(null=True, default=None)
+
+    class Meta:
+        table = "outbox"
+        indexes = (("status", "next_attempt_at"),)
+
+
+class OutboxDeadLetter(Model):
+    id = fields.IntField(pk=True)
+    dedup_key = fields.CharField(max_length=255)
+    chat_id = fields.BigIntField()
+    text = fields.TextField()
+    reply_markup = fields.TextField(null=True, default=None)
+    attempts = fields.IntField()
+    last_error = fields.TextField(null=True, default=None)
+    created_at = fields.DatetimeField()
+    failed_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:
+        table = "outbox_dead_letters"
+
+
+class RuntimeState(Model):
+    key = fields.CharField(max_length=255, pk=True)
+    value = fields.TextField()
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = "runtime_state"
+
+
+class ScheduledJob(Model):
+    id = fields.IntField(pk=True)
+    key = fields.CharField(max_length=255, unique=True)
+    kind = fields.CharField(max_length=32)
+    event = fields.ForeignKeyField(
+        "models.Event",
+        related_name="jobs",
+        on_delete=fields.CASCADE,
+        null=True,
+        default=None
+    )
+    run_at = fields.DatetimeField()
+    status = fields.CharField(max_length=16, default='pending')
+    attempts = fields.IntField(default=0)
+    last_error = fields.TextField(null=True, default=None)
+    revision = fields.BigIntField(default=0)
+    updated_at = fields.DatetimeField(index=True)
+    finished_at = fields.DatetimeField(null=True, default=None)
+
+    class Meta:
+        table = "scheduled_jobs"
+        indexes = (("status", "run_at"),)
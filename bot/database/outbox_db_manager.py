@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+
+from tortoise import timezone
+from tortoise.transactions import in_transaction
+
+from database.models import OutboxDeadLetter, OutboxMessage
+
+
+async def outbox_enqueue(
+        dedup_key: str,
+        chat_id: int,
+        text: str,
+        reply_markup: str | None = None,
+) -> None:
+    """
+    Stores a message for the outbox sender, a message with a known dedup key is ignored.
+    """
+    await OutboxMessage.bulk_create(
+        [
+            OutboxMessage(
+                dedup_key=dedup_key,
+                chat_id=chat_id,
+                text=text,
+                reply_markup=reply_markup,
+                next_attempt_at=timezone.now(),
+            )
+        ],
+        ignore_conflicts=True,
+    )
+
+
+async def outbox_due(limit: int) -> list[OutboxMessage]:
+    return await (
+        OutboxMessage.filter(status='pending', next_attempt_at__lte=timezone.now())
+        .order_by('id')
+        .limit(limit)
+    )
+
+
+async def outbox_next_attempt_at() -> datetime | None:
+    message = await (
+        OutboxMessage.filter(status='pending')
+        .order_by('next_attempt_at')
+        .first()
+        .only('id', 'next_attempt_at')
+    )
+    return message.next_attempt_at if message else None
+
+
+async def outbox_complete(
+        sent: list[OutboxMessage],
+        retried: list[OutboxMessage],
+        dead: list[OutboxMessage],
+) -> None:
+    """
+    Saves the results of a batch in one transaction.
+
+    Sent messages are marked as sent, retried ones must already carry their
+    new ``attempts``, ``next_attempt_at`` and ``last_error``, dead ones are
+    moved to the dead letter table.
+    """
+    now = timezone.now()
+    async with in_transaction():
+        if sent:
+            await OutboxMessage.filter(id__in=[message.id for message in sent]).update(
+                status='sent',
+                sent_at=now,
+            )
+        # Not bulk_update: it writes datetimes in another text format on SQLite,
+        # which breaks the next_attempt_at comparison.
+        for message in retried:
+            await OutboxMessage.filter(id=message.id).update(
+                attempts=message.attempts,
+                next_attempt_at=message.next_attempt_at,
+                last_error=message.last_error,
+            )
+        if dead:
+            await OutboxDeadLetter.bulk_create([
+                OutboxDeadLetter(
+                    dedup_key=message.dedup_key,
+                    chat_id=message.chat_id,
+                    text=message.text,
+                    reply_markup=message.reply_markup,
+                    attempts=message.attempts,
+                    last_error=message.last_error,
+                    created_at=message.created_at,
+                )
+                for message in dead
+            ])
+            # The row stays (as dead) so that its dedup key keeps blocking repeats.
+            await OutboxMessage.filter(id__in=[message.id for message in dead]).update(
+                status='dead',
+            )
+
+
+async def outbox_purge(older_than: timedelta) -> int:
+    """
+    Deletes sent and dead messages, together with their dedup keys, after ``older_than``.
+    """
+    return await OutboxMessage.filter(
+        status__in=('sent', 'dead'),
+        created_at__lt=timezone.now() - older_than,
+    ).delete()
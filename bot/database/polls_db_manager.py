@@ -0,0 +1,154 @@
+import logging
+from typing import Any
+
+from tortoise import timezone
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.expressions import F, Q
+from tortoise.functions import Count, Sum
+from tortoise.transactions import in_transaction
+
+from database.models import Event, EventSummary, Poll
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FIELDS = ('attending', 'not_attending', 'drivers', 'seats')
+POLL_FIELDS = ('is_attending', 'reason_not_attending', 'can_provide_ride', 'car_capacity', 'start_location')
+POLL_COLUMNS = tuple(f'"{field}"' for field in POLL_FIELDS)
+
+
+def poll_contribution(poll: Poll | None) -> dict[str, int]:
+    """
+    Returns what one answer adds to the summary of its event, a driver counts only if attending.
+    """
+    counters = dict.fromkeys(SUMMARY_FIELDS, 0)
+    if poll is None:
+        return counters
+    if poll.is_attending:
+        counters['attending'] = 1
+        if poll.can_provide_ride:
+            counters['drivers'] = 1
+            counters['seats'] = poll.car_capacity or 0
+    else:
+        counters['not_attending'] = 1
+    return counters
+
+
+async def _apply_summary_delta(event_id: int, delta: dict[str, int]) -> None:
+    delta = {field: value for field, value in delta.items() if value}
+    if not delta:
+        return
+    await EventSummary.bulk_create([EventSummary(event_id=event_id)], ignore_conflicts=True)
+    await EventSummary.filter(event_id=event_id).update(
+        **{field: F(field) + value for field, value in delta.items()}
+    )
+
+
+async def _lock_previous_answer(connection: BaseDBAsyncClient, user_id: int, event_id: int) -> Poll | None:
+    """
+    Returns the stored answer of the user, locked until the end of the transaction.
+
+    On SQLite a no-op ``UPDATE ... RETURNING`` is used instead of a SELECT:
+    the transaction takes the database write lock with its first statement,
+    so no other process can write between this read and the upsert, and a
+    deferred transaction is never upgraded from a stale read snapshot.
+    """
+    if connection.capabilities.dialect != 'sqlite':
+        return await (
+            Poll.filter(user_id=user_id, event_id=event_id)
+            .select_for_update()
+            .using_db(connection)
+            .first()
+        )
+    _, rows = await connection.execute_query(
+        'UPDATE "polls" SET "id" = "id" WHERE "user_id" = ? AND "event_id" = ? '
+        f'RETURNING {", ".join(POLL_COLUMNS)}',
+        [user_id, event_id],
+    )
+    if not rows:
+        return None
+    fields_map = Poll._meta.fields_map
+    return Poll(**{field: fields_map[field].to_python_value(rows[0][field]) for field in POLL_FIELDS})
+
+
+async def poll_save(user_id: int, event_id: int, **kwargs) -> Poll | None:
+    """
+    Saves the answer of a user to the poll of an event and updates the event summary.
+
+    The answer is written with one ``INSERT ... ON CONFLICT (user_id,
+    event_id) DO UPDATE`` statement backed by the unique index on the pair,
+    so answers arriving at the same time never produce two rows. Only the
+    given fields are changed on conflict, ``is_attending`` is required for
+    the first answer. The summary gets the difference between the new and
+    the previous answer in the same transaction.
+
+    The poll is closed when the event expires: the expiry is checked after
+    the lock is taken, so no answer is saved after the summary was reported.
+
+    Returns the previous answer of the user, ``None`` for the first one.
+
+    :raises ValueError: If the event does not exist or its poll is closed.
+    """
+    fields: dict[str, Any] = {key: value for key, value in kwargs.items() if key in POLL_FIELDS}
+    async with in_transaction() as connection:
+        previous = await _lock_previous_answer(connection, user_id, event_id)
+        expire = await Event.filter(id=event_id).using_db(connection).first().values_list('expire', flat=True)
+        if expire is None:
+            raise ValueError(
+                f'Event with {event_id} does not exist.'
+            )
+        if expire <= timezone.now():
+            raise ValueError(
+                f'Poll of event {event_id} is closed.'
+            )
+        answer = {field: getattr(previous, field, None) for field in POLL_FIELDS} | fields
+        await Poll.bulk_create(
+            [Poll(user_id=user_id, event_id=event_id, **answer)],
+            on_conflict=['user_id', 'event_id'],
+            update_fields=list(fields) or ['is_attending'],
+            using_db=connection,
+        )
+        old = poll_contribution(previous)
+        new = poll_contribution(Poll(**answer))
+        await _apply_summary_delta(event_id, {field: new[field] - old[field] for field in SUMMARY_FIELDS})
+    return previous
+
+
+async def get_event_summary(event_id: int) -> EventSummary:
+    """
+    Returns the summary of an event with a primary key lookup, zeros for an event without answers.
+    """
+    summary = await EventSummary.get_or_none(event_id=event_id)
+    return summary or EventSummary(event_id=event_id)
+
+
+async def rebuild_event_summary(event_id: int) -> EventSummary:
+    """
+    Recounts the summary of an event from its polls with one aggregate query and saves it.
+
+    Used to verify the incremental counters: a difference is logged. It
+    also fixes summaries after polls were deleted by the users cascade.
+    """
+    driving = Q(is_attending=True, can_provide_ride=True)
+    async with in_transaction():
+        row = await (
+            Poll.filter(event_id=event_id)
+            .annotate(
+                attending=Count('id', _filter=Q(is_attending=True)),
+                not_attending=Count('id', _filter=Q(is_attending=False)),
+                drivers=Count('id', _filter=driving),
+                seats=Sum('car_capacity', _filter=driving),
+            )
+            .first()
+            .values(*SUMMARY_FIELDS)
+        )
+        counters = {field: (row or {}).get(field) or 0 for field in SUMMARY_FIELDS}
+        current = await get_event_summary(event_id)
+        stored = {field: getattr(current, field) for field in SUMMARY_FIELDS}
+        if stored != counters:
+            logger.warning('Summary of event %d was %s, recounted %s', event_id, stored, counters)
+        await EventSummary.bulk_create(
+            [EventSummary(event_id=event_id, **counters)],
+            on_conflict=['event_id'],
+            update_fields=list(SUMMARY_FIELDS),
+        )
+    return EventSummary(event_id=event_id, **counters)
@@ -0,0 +1,26 @@
+from typing import Any
+
+from tortoise.transactions import in_transaction
+
+from database.models import Poll, RideShare
+
+
+async def get_attending_polls(event_id: int) -> list[dict[str, Any]]:
+    return await (
+        Poll.filter(event_id=event_id, is_attending=True)
+        .order_by('id')
+        .values('user_id', 'can_provide_ride', 'car_capacity', 'start_location')
+    )
+
+
+async def rides_replace(event_id: int, rides: list[tuple[int, int]]) -> None:
+    """
+    Replaces the rides of an event with the given (driver user id, passenger user id) pairs.
+    """
+    async with in_transaction():
+        await RideShare.filter(event_id=event_id).delete()
+        if rides:
+            await RideShare.bulk_create([
+                RideShare(event_id=event_id, driver_id=driver_id, passenger_id=passenger_id)
+                for driver_id, passenger_id in rides
+            ])
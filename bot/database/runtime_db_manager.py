@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from tortoise import timezone
+
+from database.models import RuntimeState
+
+
+async def runtime_get(
+        key: str,
+        default: str | None = None,
+        max_age: timedelta | None = None,
+) -> str | None:
+    """
+    Returns the stored value of the key, or ``default`` if it is missing or older than ``max_age``.
+    """
+    state = await RuntimeState.get_or_none(key=key)
+    if state is None or (max_age is not None and state.updated_at < timezone.now() - max_age):
+        return default
+    return state.value
+
+
+async def runtime_set(key: str, value: str) -> None:
+    await RuntimeState.bulk_create(
+        [RuntimeState(key=key, value=value, updated_at=timezone.now())],
+        on_conflict=['key'],
+        update_fields=['value', 'updated_at'],
+    )
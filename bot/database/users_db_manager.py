@@ -1,32 +1,241 @@
-from typing import Any
+import asyncio
+import copy
+from itertools import count
+from typing import Any, Callable, Iterable, NamedTuple
+
+from tortoise.transactions import in_transaction
 
 from database.models import User
+from settings.settings import USER_CACHE_SIZE, USER_CACHE_TTL
+from utils.cache import LRUCache, MISSING
+from utils.callsign_index import CallsignIndex
+
+USERS_PAGE_SIZE = 9
+BULK_UPDATE_CHUNK_SIZE = 500
+
+USER_UPDATABLE_FIELDS = User._meta.db_fields - {'id', 'telegram_id'}
+
+# Users by telegram_id, None marks a telegram_id known to have no row.
+# Every write to the users table goes through this module and keeps it fresh.
+user_cache = LRUCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+# Stamp of the last write of every user. A read that started before a
+# write of the same user must not put its result into the cache.
+_write_stamps = count(1)
+_user_written: dict[int, int] = {}
+_all_written = 0
+
+# Listed users sorted by callsign, loaded by the first page request and
+# changed in place by the writes below.
+users_index = CallsignIndex()
+_users_index_lock = asyncio.Lock()
+
+# Called with the telegram_id of every created, updated or deleted user, lets
+# other processes drop their copies (see invalidate_user).
+user_change_listeners: list[Callable[[int], None]] = []
+
+# Bumped whenever the list of users (who is listed and under which callsign)
+# may have changed, cached user pages and keyboards are keyed by it.
+users_list_version = 0
+USERS_LIST_FIELDS = {'name', 'callsign'}
+
+
+def get_users_list_version() -> int:
+    return users_list_version
+
+
+def _users_list_changed(telegram_id: int, fields: dict[str, Any] | None = None) -> None:
+    """
+    Bumps the users list version and moves the user in the callsign index.
+
+    ``fields`` are the new column values, ``None`` means that the row was
+    deleted. When the index does not know both the name and the callsign
+    after the change, the user is read again by the next page request.
+    """
+    global users_list_version
+    users_list_version += 1
+    if fields is None:
+        users_index.remove(telegram_id)
+        users_index.stale.discard(telegram_id)
+        return
+    if not users_index.loaded:
+        users_index.stale.add(telegram_id)
+        return
+
+    current = users_index.get(telegram_id)
+    cached = user_cache.peek(telegram_id)
+    if 'name' in fields and 'callsign' in fields:
+        users_index.put(telegram_id, fields['callsign'], fields['name'])
+    elif current is not None:
+        users_index.put(
+            telegram_id,
+            fields.get('callsign', current.callsign),
+            fields.get('name', current.name),
+        )
+    elif cached is not MISSING and cached is not None:
+        # Already refreshed with the new values by _refresh_cached_user.
+        users_index.put(telegram_id, cached.callsign, cached.name)
+    else:
+        users_index.stale.add(telegram_id)
+
+
+def _user_written_now(telegram_id: int) -> None:
+    _user_written[telegram_id] = next(_write_stamps)
+
+
+def _cache_read_user(telegram_id: int, user: User | None, started: int) -> None:
+    """
+    Caches a user read from the database unless it was written while the query ran.
+
+    :param started: Write stamp taken before the query, see ``_read_stamp``.
+    """
+    if max(_user_written.get(telegram_id, 0), _all_written) <= started:
+        user_cache.set(telegram_id, user)
+
+
+def _read_stamp() -> int:
+    # Every later write gets a greater stamp.
+    return next(_write_stamps)
+
+
+def add_user_change_listener(listener: Callable[[int], None]) -> None:
+    user_change_listeners.append(listener)
+
+
+def _notify_user_changed(telegram_id: int) -> None:
+    for listener in user_change_listeners:
+        listener(telegram_id)
+
+
+def invalidate_user(telegram_id: int) -> None:
+    """
+    Drops everything cached about the user after it was changed by another process.
+    """
+    user_cache.pop(telegram_id)
+    _user_written_now(telegram_id)
+    # The kind of change is unknown here, the indexed callsign may be stale.
+    global users_list_version
+    users_list_version += 1
+    users_index.stale.add(telegram_id)
+
+
+def invalidate_all_users() -> None:
+    """
+    Drops every cached user and the callsign index after changes of other processes were lost.
+    """
+    global _all_written, users_list_version
+    _all_written = next(_write_stamps)
+    user_cache.clear()
+    users_list_version += 1
+    users_index.loaded = False
+
+
+class UsersPage(NamedTuple):
+    users: list[dict[str, Any]]
+    cursor: str
+    prev_cursor: str | None
+    next_cursor: str | None
+
+
+# The cached instances are changed in place by the writes below, callers
+# get shallow copies so they never see a half-applied change or change the
+# cache by assigning to their user.
 
 
 async def user_get_or_create(telegram_id: int) -> User:
+    user = user_cache.get(telegram_id)
+    if user is not None:
+        return copy.copy(user)
+    started = _read_stamp()
     user, created = await User.get_or_create(telegram_id=telegram_id)
-    return user
+    if created:
+        _user_written_now(telegram_id)
+        user_cache.set(telegram_id, user)
+        _notify_user_changed(telegram_id)
+    else:
+        _cache_read_user(telegram_id, user, started)
+    return copy.copy(user)
 
 
 async def user_get_or_none(telegram_id: int) -> User | None:
-    user = await User.get_or_none(telegram_id=telegram_id)
-    return user
+    user = user_cache.get(telegram_id, MISSING)
+    if user is MISSING:
+        started = _read_stamp()
+        user = await User.get_or_none(telegram_id=telegram_id)
+        _cache_read_user(telegram_id, user, started)
+    return copy.copy(user) if user is not None else None
 
 
-async def user_update(telegram_id: int, **kwargs) -> User:
-    user = await User.filter(telegram_id=telegram_id).first()
-    if not user:
-        raise ValueError(
-            f'User with {telegram_id} does not exist.'
-        )
+def _user_fields(kwargs: dict[str, Any]) -> dict[str, Any]:
+    return {key: value for key, value in kwargs.items() if key in USER_UPDATABLE_FIELDS}
+
+
+def _refresh_cached_user(telegram_id: int, fields: dict[str, Any]) -> None:
+    user = user_cache.peek(telegram_id)
+    if user is MISSING:
+        return
+    if user is None:
+        user_cache.pop(telegram_id)
+        return
+    for key, value in fields.items():
+        setattr(user, key, value)
+
+
+async def user_update(telegram_id: int, **kwargs) -> int:
+    """
+    Updates only the given columns with a single UPDATE statement.
+
+    Keys that are not columns of the users table (leftover FSM data, for
+    example) are ignored. Returns the number of updated rows, so 0 means
+    that the user does not exist.
+    """
+    fields = _user_fields(kwargs)
+    if not fields:
+        return 0
+
+    updated = await User.filter(telegram_id=telegram_id).update(**fields)
+    _user_written_now(telegram_id)
+    if updated:
+        _refresh_cached_user(telegram_id, fields)
+        if USERS_LIST_FIELDS & fields.keys():
+            _users_list_changed(telegram_id, fields)
+        _notify_user_changed(telegram_id)
+    else:
+        user_cache.set(telegram_id, None)
 
-    for key, value in kwargs.items():
-        if hasattr(user, key):
-            setattr(user, key, value)
+    return updated
 
-    await user.save()
 
-    return user
+async def users_bulk_update(telegram_ids: Iterable[int], **kwargs) -> int:
+    """
+    Applies the same column values to many users, e.g. to approve or reserve a batch.
+
+    Rows are updated with ``WHERE telegram_id IN (...)`` statements in
+    chunks that stay below the SQLite bound parameters limit, all inside
+    one transaction. Returns the number of updated rows.
+    """
+    fields = _user_fields(kwargs)
+    telegram_ids = list(dict.fromkeys(telegram_ids))
+    if not fields or not telegram_ids:
+        return 0
+
+    updated = 0
+    async with in_transaction():
+        for start in range(0, len(telegram_ids), BULK_UPDATE_CHUNK_SIZE):
+            chunk = telegram_ids[start:start + BULK_UPDATE_CHUNK_SIZE]
+            updated += await User.filter(telegram_id__in=chunk).update(**fields)
+
+    if updated and USERS_LIST_FIELDS & fields.keys():
+        # Some of the ids may have no row, the index reads them again.
+        global users_list_version
+        users_list_version += 1
+        users_index.stale.update(telegram_ids)
+    for telegram_id in telegram_ids:
+        _user_written_now(telegram_id)
+        _refresh_cached_user(telegram_id, fields)
+        _notify_user_changed(telegram_id)
+
+    return updated
 
 
 async def user_delete(telegram_id: int) -> None:
@@ -36,24 +245,76 @@ async def user_delete(telegram_id: int) -> None:
             f'User with {telegram_id} does not exist.'
         )
     await user.delete()
+    _user_written_now(telegram_id)
+    user_cache.set(telegram_id, None)
+    _users_list_changed(telegram_id)
+    _notify_user_changed(telegram_id)
 
 
 async def is_callsign_taken(callsign: str) -> bool:
     return await User.filter(callsign=callsign).exists()
 
 
-async def get_all_users() -> list[dict[str, Any]]:
-    users = await User.all()
-    sorted_users = sorted(
-        [
-            {
-                'telegram_id': user.telegram_id,
-                'name': user.name,
-                'callsign': user.callsign
-            }
-            for user in users
-            if user.name and user.callsign
-        ],
-        key=lambda user: user['callsign'],
+def _listed_users():
+    return (
+        User.filter(name__isnull=False, callsign__isnull=False)
+        .exclude(name='')
+        .exclude(callsign='')
+    )
+
+
+async def _sync_users_index() -> None:
+    """
+    Loads the callsign index on first use and reads the stale users again.
+    """
+    async with _users_index_lock:
+        if not users_index.loaded:
+            users_index.stale.clear()
+            users_index.load(await _listed_users().values_list('callsign', 'telegram_id', 'name'))
+        if not users_index.stale:
+            return
+        telegram_ids = list(users_index.stale)
+        users_index.stale.clear()
+        rows = await User.filter(telegram_id__in=telegram_ids).values('telegram_id', 'callsign', 'name')
+        found = {row['telegram_id']: row for row in rows}
+        for telegram_id in telegram_ids:
+            row = found.get(telegram_id)
+            if row is None:
+                users_index.remove(telegram_id)
+            else:
+                users_index.put(telegram_id, row['callsign'], row['name'])
+
+
+async def get_users_page(cursor: str = '', limit: int = USERS_PAGE_SIZE) -> UsersPage:
+    """
+    Returns a page of users ordered by callsign, starting at ``cursor``.
+
+    The cursor is the callsign of the first user on the page (an empty
+    string for the first page). Pages are slices of the in-memory
+    callsign index, the database is only read for users changed by
+    another process.
+    """
+    await _sync_users_index()
+    users, prev_cursor, next_cursor = users_index.page(cursor, limit)
+    return UsersPage(
+        users=[user._asdict() for user in users],
+        cursor=cursor,
+        prev_cursor=prev_cursor,
+        next_cursor=next_cursor,
     )
-    return sorted_users
+
+
+async def get_user_page_cursor(telegram_id: int, limit: int = USERS_PAGE_SIZE) -> str | None:
+    """
+    Returns the cursor of the users page the user is on, ``None`` for a user that is not listed.
+    """
+    await _sync_users_index()
+    return users_index.page_cursor(telegram_id, limit)
+
+
+async def search_users(query: str, limit: int = USERS_PAGE_SIZE) -> list[dict[str, Any]]:
+    """
+    Finds listed users by the beginnings of their callsign and name words.
+    """
+    await _sync_users_index()
+    return [user._asdict() for user in users_index.search(query, limit)]
@@ -1,50 +1,138 @@
-from aiogram import types, Router, F
-from aiogram.filters import Command
+from aiogram import types, Router
+from aiogram.filters import Command, CommandObject
 
-from utils.decorators import is_admin
+from database.users_db_manager import search_users
+from utils.broadcaster import Broadcaster
+from utils.callback_data import AdminMenuCallback
+from utils.callback_router import callback_router
+from utils.decorators import is_admin, is_admin_id
 from utils.keyboards import (
-    generate_all_users_keyboard,
     generate_admin_keyboard,
-    generate_back_to_admin_keyboard
+    generate_back_to_admin_keyboard,
+    generate_found_users_keyboard,
 )
 
-from handlers.manage_users_handler import router as manage_users_router
-from handlers.create_event_handler import router as create_event_router
-
-from database.users_db_manager import (
-    get_all_users,
+from handlers.manage_users_handler import (
+    router as manage_users_router,
+    edit_users_page,
 )
+from handlers.create_event_handler import router as create_event_router
 
 router = Router()
 router.include_router(manage_users_router)
 router.include_router(create_event_router)
 
-ADMIN_MENU_BUTTONS = [
-    'Создать мероприятие',
-    'Показать мероприятия',
-    'Заявки на вступление',
-    'Все пользователи'
-]
+ADMIN_MENU_BUTTONS = {
+    'Создать мероприятие': 'create',
+    'Показать мероприятия': 'events',
+    'Заявки на вступление': 'requests',
+    'Все пользователи': 'users',
+}
+
+ADMIN_KEYBOARD = generate_admin_keyboard(ADMIN_MENU_BUTTONS)
+
+INLINE_RESULTS_LIMIT = 20
 
 
 @router.message(Command(commands=['admin']))
-@router.callback_query(F.data == 'back:админ')
+@callback_router.register(AdminMenuCallback, action='menu')
 @is_admin
 async def admin_command(interaction: types.Message | types.CallbackQuery) -> None:
     text = 'Админ меню'
     if isinstance(interaction, types.CallbackQuery):
         await interaction.message.edit_text(
             text=text,
-            reply_markup=generate_admin_keyboard(ADMIN_MENU_BUTTONS)
+            reply_markup=ADMIN_KEYBOARD
         )
     else:
         await interaction.answer(
             text=text,
-            reply_markup=generate_admin_keyboard(ADMIN_MENU_BUTTONS)
+            reply_markup=ADMIN_KEYBOARD
+        )
+
+
+@router.message(Command(commands=['broadcast']))
+@is_admin
+async def broadcast_command(
+        message: types.Message,
+        command: CommandObject,
+        broadcaster: Broadcaster
+) -> None:
+    """
+    Sends the text after the command to all team members.
+
+    Args:
+        message (types.Message): The message with the command.
+        command (CommandObject): The parsed command, its args are the text to send.
+        broadcaster (Broadcaster): The broadcast engine of the bot.
+    """
+    if not command.args:
+        await message.answer(text='Напиши текст рассылки после команды: /broadcast текст')
+        return
+    await broadcaster.start(
+        key=f'admin:{message.chat.id}:{message.message_id}',
+        text=command.args,
+        created_by=message.from_user.id,
+    )
+    await message.answer(text='Рассылка запущена, по окончании придет отчет.')
+
+
+@router.message(Command(commands=['find']))
+@is_admin
+async def find_command(message: types.Message, command: CommandObject) -> None:
+    """
+    Finds team members by the beginnings of their callsign or name words.
+
+    Args:
+        message (types.Message): The message with the command.
+        command (CommandObject): The parsed command, its args are the search query.
+    """
+    if not command.args:
+        await message.answer(text='Напиши позывной или имя после команды: /find позывной')
+        return
+    users = await search_users(command.args)
+    if not users:
+        await message.answer(
+            text='Никого не нашел',
+            reply_markup=generate_back_to_admin_keyboard()
         )
+        return
+    await message.answer(
+        text='Найденные пользователи',
+        reply_markup=generate_found_users_keyboard(users)
+    )
+
+
+@router.inline_query()
+async def find_inline(inline_query: types.InlineQuery) -> None:
+    """
+    Suggests team members while an admin types "@bot callsign", picking one sends /find with the callsign.
+
+    Args:
+        inline_query (types.InlineQuery): The inline query with the search text.
+    """
+    if not is_admin_id(inline_query.from_user.id):
+        await inline_query.answer(results=[], cache_time=300, is_personal=True)
+        return
+    users = await search_users(inline_query.query, limit=INLINE_RESULTS_LIMIT)
+    await inline_query.answer(
+        results=[
+            types.InlineQueryResultArticle(
+                id=str(user['telegram_id']),
+                title=user['callsign'].capitalize(),
+                description=user['name'].title(),
+                input_message_content=types.InputTextMessageContent(
+                    message_text=f"/find {user['callsign']}"
+                ),
+            )
+            for user in users
+        ],
+        cache_time=0,
+        is_personal=True,
+    )
 
 
-@router.callback_query(F.data == 'admin:показать')
+@callback_router.register(AdminMenuCallback, action='events')
 async def show_events(callback: types.CallbackQuery) -> None:
     await callback.message.edit_text(
         text='Нет добавленных мероприятий',
@@ -52,7 +140,7 @@ async def show_events(callback: types.CallbackQuery) -> None:
     )
 
 
-@router.callback_query(F.data == 'admin:заявки')
+@callback_router.register(AdminMenuCallback, action='requests')
 async def show_surveys(callback: types.CallbackQuery) -> None:
     await callback.message.edit_text(
         text='Новых заявок нет',
@@ -60,16 +148,6 @@ async def show_surveys(callback: types.CallbackQuery) -> None:
     )
 
 
-@router.callback_query(F.data == 'admin:все')
+@callback_router.register(AdminMenuCallback, action='users')
 async def show_all_users(callback: types.CallbackQuery) -> None:
-    users = await get_all_users()
-    if not users:
-        await callback.message.edit_text(
-            text='Нет сохраненных пользователей чат-бота',
-            reply_markup=generate_back_to_admin_keyboard()
-        )
-        return
-    await callback.message.edit_text(
-        text='Все пользователи',
-        reply_markup=generate_all_users_keyboard(users=users)
-    )
+    await edit_users_page(message=callback.message)
@@ -1,7 +1,10 @@
-from aiogram import types, Router, F
+from aiogram import types, Router
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
 
+from utils.callback_data import AdminMenuCallback
+from utils.callback_router import callback_router
+
 router = Router()
 
 
@@ -15,7 +18,7 @@ class Event(StatesGroup):
     expire = State()
 
 
-@router.callback_query(F.data == 'admin:создать')
+@callback_router.register(AdminMenuCallback, action='create')
 async def create_event(callback: types.CallbackQuery, state: FSMContext):
     await state.set_state(Event.name)
     await callback.message.answer(
@@ -7,6 +7,7 @@ from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemo
 
 from handlers.cancel_handler import cancel_handler
 
+from utils.outbox import enqueue_message
 from utils.text_answers import answers
 from utils.text_utils import merge_message_parts, calculate_age
 from utils.decorators import (
@@ -373,7 +374,9 @@ async def validate_agreement(message: types.Message, state: FSMContext) -> None:
     await state.update_data(agreement=agreement_status)
     data = await state.get_data()
     await user_update(telegram_id=message.from_user.id, **data)
-    await message.answer(
+    await enqueue_message(
+        dedup_key=f'join:{message.chat.id}:{message.message_id}',
+        chat_id=message.chat.id,
         text='Опрос пройден! Спасибо!',
         reply_markup=ReplyKeyboardRemove()
     )
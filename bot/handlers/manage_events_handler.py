@@ -1,4 +1,4 @@
 # TODO клавиатура как у пользователей, но выводятся все мероприятия
 # TODO кнопки перелистывания мероприятий
 # TODO в самом меню мероприятия реализовать клавиатуру: редактирование всех пунктов мероприятия, удаление мероприятия,
-# TODO оповещение пользователей о новом мероприятии, авто-создание чата по мероприятию, назад к мероприятиям и адм. меню
+# TODO авто-создание чата по мероприятию, назад к мероприятиям и адм. меню
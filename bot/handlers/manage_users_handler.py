@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from aiogram import types, Router, F
+from aiogram import types, Router
 from aiogram.enums import ParseMode
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
@@ -10,12 +10,22 @@ from utils.decorators import (
     is_text,
 )
 from utils.text_utils import merge_message_parts, calculate_age
+from utils.callback_data import (
+    ConfirmUserDeletionCallback,
+    DeleteUserCallback,
+    UserCallback,
+    UserEditCallback,
+    UsersPageCallback,
+)
+from utils.callback_router import callback_router
 
 from database.users_db_manager import (
     user_update,
     is_callsign_taken,
     user_delete,
-    get_all_users,
+    get_users_page,
+    get_users_list_version,
+    get_user_page_cursor,
     user_get_or_none,
 )
 
@@ -33,13 +43,13 @@ router = Router()
 
 CANCEL_REMINDER = answers.get('CANCEL_REMINDER')
 
-EDIT_USER_MENU_BUTTONS = [
-    'Ред. имя',
-    'Ред. позывной',
-    'Ред. возраст',
-    'Ред. авто',
-    'Ред. бронь'
-]
+EDIT_USER_MENU_BUTTONS = {
+    'Ред. имя': 'name',
+    'Ред. позывной': 'callsign',
+    'Ред. возраст': 'age',
+    'Ред. авто': 'car',
+    'Ред. бронь': 'reserved',
+}
 
 
 class User(StatesGroup):
@@ -93,27 +103,58 @@ async def prepare_for_editing(
     )
 
 
-@router.callback_query(F.data.startswith('users_page-'))
-async def change_users_page(callback: types.CallbackQuery) -> None:
-    page = int(callback.data.split('-')[1])
-    users = await get_all_users()
-    if not users:
-        await callback.message.edit_text(
+async def edit_users_page(message: types.Message, cursor: str = '', text: str = 'Все пользователи') -> None:
+    """
+    Replaces the message with the page of users that starts at the given cursor.
+
+    Args:
+        message (types.Message): Message with the users keyboard to edit.
+        cursor (str): Callsign of the first user on the page.
+        text (str): Text shown above the users keyboard.
+
+    Returns:
+        None
+    """
+    # Read before the page, a change made meanwhile bumps it again.
+    version = get_users_list_version()
+    page = await get_users_page(cursor=cursor)
+    if not page.users and cursor:
+        page = await get_users_page(cursor=page.prev_cursor or '')
+    if not page.users:
+        await message.edit_text(
             text='Нет сохраненных пользователей чат-бота',
             reply_markup=generate_back_to_admin_keyboard()
         )
+        return
 
-    await callback.message.edit_text(
-        text='Все пользователи',
-        reply_markup=generate_all_users_keyboard(users=users, page=page)
+    await message.edit_text(
+        text=text,
+        reply_markup=generate_all_users_keyboard(
+            users=page.users,
+            version=version,
+            cursor=page.cursor,
+            prev_cursor=page.prev_cursor,
+            next_cursor=page.next_cursor
+        )
+    )
+
+
+@callback_router.register(UsersPageCallback)
+async def change_users_page(callback: types.CallbackQuery, callback_data: UsersPageCallback) -> None:
+    await edit_users_page(
+        message=callback.message,
+        cursor=callback_data.cursor or '',
+        text='Все пользователи:' if callback_data.back else 'Все пользователи'
     )
 
 
-@router.callback_query(F.data.startswith('user:'))
-async def show_user_info(callback: types.CallbackQuery) -> None:
-    parts = callback.data.split('-')
-    telegram_id = int(parts[0].split(':')[1])
-    page = int(parts[1]) if len(parts) > 1 else 1
+@callback_router.register(UserCallback)
+async def show_user_info(callback: types.CallbackQuery, callback_data: UserCallback) -> None:
+    telegram_id = callback_data.telegram_id
+    cursor = callback_data.cursor
+    if cursor is None:
+        # Opened without a page (or from the first one), go back to the user's page.
+        cursor = await get_user_page_cursor(telegram_id=telegram_id) or ''
 
     user = await user_get_or_none(telegram_id=telegram_id)
     if not user:
@@ -122,10 +163,7 @@ async def show_user_info(callback: types.CallbackQuery) -> None:
                  'меню со всеми пользователями.',
             show_alert=True
         )
-        await callback.message.edit_text(
-            text='Все пользователи',
-            reply_markup=generate_all_users_keyboard(users=await get_all_users(), page=page)
-        )
+        await edit_users_page(message=callback.message, cursor=cursor)
         return
     name = ' '.join(word.capitalize() for word in user.name.split())
     callsign = user.callsign.capitalize()
@@ -164,28 +202,21 @@ async def show_user_info(callback: types.CallbackQuery) -> None:
              f'<b>8. ОСОБОЖДЕНИЕ ОТ ОПРОСОВ:</b> {reserved}',
         reply_markup=generate_edit_user_keyboard(
             telegram_id=telegram_id,
-            page=page,
-            array=EDIT_USER_MENU_BUTTONS
+            cursor=cursor,
+            buttons=EDIT_USER_MENU_BUTTONS
         ),
         parse_mode=ParseMode.HTML
     )
 
 
-@router.callback_query(F.data.startswith('back:users_page-'))
-async def back_to_users_page(callback: types.CallbackQuery) -> None:
-    page = int(callback.data.split('-')[1])
-
-    users = await get_all_users()
-
-    await callback.message.edit_text(
-        text='Все пользователи:',
-        reply_markup=generate_all_users_keyboard(users=users, page=page)
-    )
-
-
-@router.callback_query(F.data.startswith('user_edit:имя'))
+@callback_router.register(UserEditCallback, field='name')
 @check_user_existence
-async def edit_user_name(callback: types.CallbackQuery, state: FSMContext, user: dict) -> None:
+async def edit_user_name(
+        callback: types.CallbackQuery,
+        state: FSMContext,
+        user: dict,
+        callback_data: UserEditCallback
+) -> None:
     """
     Handles the callback for editing a user's name.
 
@@ -193,6 +224,7 @@ async def edit_user_name(callback: types.CallbackQuery, state: FSMContext, user:
         callback (types.CallbackQuery): Callback query instance triggering the edit.
         state (FSMContext): Finite state machine context.
         user (dict): User data dictionary.
+        callback_data (UserEditCallback): The edited field and the user's Telegram ID.
 
     Returns:
         None
@@ -234,9 +266,7 @@ async def validate_new_name(message: types.Message, state: FSMContext) -> None:
     data = await state.get_data()
     telegram_id = data.get('telegram_id')
 
-    try:
-        await user_update(telegram_id=telegram_id, name=validated_input.name.lower())
-    except ValueError:
+    if not await user_update(telegram_id=telegram_id, name=validated_input.name.lower()):
         await state.clear()
         await message.answer(
             text='Пользователь не был найден. Изменение ФИО '
@@ -252,9 +282,14 @@ async def validate_new_name(message: types.Message, state: FSMContext) -> None:
     await state.clear()
 
 
-@router.callback_query(F.data.startswith('user_edit:позывной'))
+@callback_router.register(UserEditCallback, field='callsign')
 @check_user_existence
-async def edit_user_callsign(callback: types.CallbackQuery, state: FSMContext, user: dict) -> None:
+async def edit_user_callsign(
+        callback: types.CallbackQuery,
+        state: FSMContext,
+        user: dict,
+        callback_data: UserEditCallback
+) -> None:
     """
     Handles the callback for editing a user's callsign.
 
@@ -262,6 +297,7 @@ async def edit_user_callsign(callback: types.CallbackQuery, state: FSMContext, u
         callback (types.CallbackQuery): Callback query instance triggering the edit.
         state (FSMContext): Finite state machine context.
         user (dict): User data dictionary.
+        callback_data (UserEditCallback): The edited field and the user's Telegram ID.
 
     Returns:
         None
@@ -315,9 +351,7 @@ async def validate_new_callsign(message: types.Message, state: FSMContext) -> No
 
     data = await state.get_data()
     telegram_id = data.get('telegram_id')
-    try:
-        await user_update(telegram_id=telegram_id, callsign=validated_input)
-    except ValueError:
+    if not await user_update(telegram_id=telegram_id, callsign=validated_input):
         await state.clear()
         await message.answer(
             text='Пользователь не найден. Изменение позывного '
@@ -333,9 +367,14 @@ async def validate_new_callsign(message: types.Message, state: FSMContext) -> No
     await state.clear()
 
 
-@router.callback_query(F.data.startswith('user_edit:возраст'))
+@callback_router.register(UserEditCallback, field='age')
 @check_user_existence
-async def edit_user_age(callback: types.CallbackQuery, state: FSMContext, user: dict) -> None:
+async def edit_user_age(
+        callback: types.CallbackQuery,
+        state: FSMContext,
+        user: dict,
+        callback_data: UserEditCallback
+) -> None:
     """
     Handles the callback for editing a user's age.
 
@@ -343,6 +382,7 @@ async def edit_user_age(callback: types.CallbackQuery, state: FSMContext, user:
         callback (types.CallbackQuery): Callback query instance triggering the edit.
         state (FSMContext): Finite state machine context.
         user (dict): User data dictionary.
+        callback_data (UserEditCallback): The edited field and the user's Telegram ID.
 
     Returns:
         None
@@ -393,9 +433,7 @@ async def validate_new_age(message: types.Message, state: FSMContext) -> None:
 
     data = await state.get_data()
     telegram_id = data.get('telegram_id')
-    try:
-        await user_update(telegram_id=telegram_id, age=validated_input)
-    except ValueError:
+    if not await user_update(telegram_id=telegram_id, age=validated_input):
         await state.clear()
         await message.answer(
             text='Пользователь не был найден. Изменение даты рождения '
@@ -410,9 +448,14 @@ async def validate_new_age(message: types.Message, state: FSMContext) -> None:
     await state.clear()
 
 
-@router.callback_query(F.data.startswith('user_edit:авто'))
+@callback_router.register(UserEditCallback, field='car')
 @check_user_existence
-async def edit_user_car(callback: types.CallbackQuery, state: FSMContext, user: dict) -> None:
+async def edit_user_car(
+        callback: types.CallbackQuery,
+        state: FSMContext,
+        user: dict,
+        callback_data: UserEditCallback
+) -> None:
     """
     Toggles the "car" attribute of a user.
 
@@ -420,6 +463,7 @@ async def edit_user_car(callback: types.CallbackQuery, state: FSMContext, user:
         callback (types.CallbackQuery): Callback query instance triggering the update.
         state (FSMContext): Finite state machine context.
         user (dict): User data dictionary.
+        callback_data (UserEditCallback): The edited field and the user's Telegram ID.
 
     Returns:
         None
@@ -442,9 +486,14 @@ async def edit_user_car(callback: types.CallbackQuery, state: FSMContext, user:
     )
 
 
-@router.callback_query(F.data.startswith('user_edit:бронь'))
+@callback_router.register(UserEditCallback, field='reserved')
 @check_user_existence
-async def edit_user_reserved(callback: types.CallbackQuery, state: FSMContext, user: dict) -> None:
+async def edit_user_reserved(
+        callback: types.CallbackQuery,
+        state: FSMContext,
+        user: dict,
+        callback_data: UserEditCallback
+) -> None:
     """
     Toggles the "reserved" attribute of a user.
 
@@ -452,6 +501,7 @@ async def edit_user_reserved(callback: types.CallbackQuery, state: FSMContext, u
         callback (types.CallbackQuery): Callback query instance triggering the update.
         state (FSMContext): Finite state machine context.
         user (dict): User data dictionary.
+        callback_data (UserEditCallback): The edited field and the user's Telegram ID.
 
     Returns:
         None
@@ -480,23 +530,27 @@ async def edit_user_reserved(callback: types.CallbackQuery, state: FSMContext, u
     )
 
 
-@router.callback_query(F.data.startswith('delete_user'))
+@callback_router.register(DeleteUserCallback)
 @check_user_existence
-async def delete_user(callback: types.CallbackQuery, state: FSMContext, user: dict) -> None:
+async def delete_user(
+        callback: types.CallbackQuery,
+        state: FSMContext,
+        user: dict,
+        callback_data: DeleteUserCallback
+) -> None:
     """
     Initiates the process of deleting a user by prompting for confirmation.
 
     Args:
-        callback (types.CallbackQuery): Callback query instance containing the user's Telegram ID
-            and the current page in the callback data.
+        callback (types.CallbackQuery): Callback query instance triggering the deletion.
         state (FSMContext): Finite state machine context to manage ongoing commands.
         user (dict): Dictionary containing user data, such as the callsign.
+        callback_data (DeleteUserCallback): The user's Telegram ID and the page cursor.
 
     Returns:
         None
     """
-    telegram_id = int(callback.data.split(':')[1].split('-')[0])
-    page = int(callback.data.split('-')[1])
+    telegram_id, cursor = callback_data.telegram_id, callback_data.cursor or ''
     if await state.get_state() is not None:
         await callback.message.answer(
             text='Выполнение команды прекращено.'
@@ -505,24 +559,26 @@ async def delete_user(callback: types.CallbackQuery, state: FSMContext, user: di
     await callback.message.edit_text(
         text=f'Уверены, что хотите удалить пользователя '
              f'{user.callsign.capitalize()}?',
-        reply_markup=generate_delete_user_keyboard(telegram_id=telegram_id, page=page)
+        reply_markup=generate_delete_user_keyboard(telegram_id=telegram_id, cursor=cursor)
     )
 
 
-@router.callback_query(F.data.startswith('confirm_user_deletion'))
-async def confirm_user_deletion(callback: types.CallbackQuery) -> None:
+@callback_router.register(ConfirmUserDeletionCallback)
+async def confirm_user_deletion(
+        callback: types.CallbackQuery,
+        callback_data: ConfirmUserDeletionCallback
+) -> None:
     """
     Confirms and performs the deletion of a user.
 
     Args:
-        callback (types.CallbackQuery): Callback query instance containing the user's Telegram ID
-            and the current page in the callback data.
+        callback (types.CallbackQuery): Callback query instance confirming the deletion.
+        callback_data (ConfirmUserDeletionCallback): The user's Telegram ID and the page cursor.
 
     Returns:
         None
     """
-    telegram_id = int(callback.data.split(':')[1].split('-')[0])
-    page = int(callback.data.split('-')[1])
+    telegram_id, cursor = callback_data.telegram_id, callback_data.cursor or ''
 
     try:
         await user_delete(telegram_id=telegram_id)
@@ -532,10 +588,7 @@ async def confirm_user_deletion(callback: types.CallbackQuery) -> None:
             show_alert=True
         )
 
-        await callback.message.edit_text(
-            text='Все пользователи',
-            reply_markup=generate_all_users_keyboard(users=await get_all_users(), page=page),
-        )
+        await edit_users_page(message=callback.message, cursor=cursor)
         return
 
     await callback.answer(
@@ -543,7 +596,4 @@ async def confirm_user_deletion(callback: types.CallbackQuery) -> None:
         show_alert=True
     )
 
-    await callback.message.edit_text(
-        text='Все пользователи',
-        reply_markup=generate_all_users_keyboard(users=await get_all_users(), page=page)
-    )
+    await edit_users_page(message=callback.message, cursor=cursor)
@@ -1,3 +1,4 @@
+import logging
 from asyncio import run
 
 from database.init import init
@@ -7,8 +8,11 @@ from settings.settings import (
     WEBHOOK_PATH,
     WEB_SERVER_PORT,
     WEB_SERVER_HOST,
-    BASE_WEBHOOK_URL
+    BASE_WEBHOOK_URL,
+    BOT_MODE,
+    SETTINGS_LOAD_SECONDS
 )
+from utils.timing import record_startup_phase
 
 
 def main() -> None:
@@ -19,9 +23,8 @@ def main() -> None:
     such as the bot token, webhook URL, webhook path, server host, and port. It also initializes the
     database by running the `init` function before starting the bot.
 
-    The bot is configured to run in webhook mode (not polling), which listens for updates via
-    webhooks sent to the specified URL. For testing purposes, you can uncomment the polling line
-    to run the bot in polling mode instead.
+    The mode is selected by the BOT_MODE setting: "webhook" (default) listens for updates via
+    webhooks sent to the specified URL, "polling" long polls the Telegram API and needs no public URL.
 
     Steps:
         1. Initialize the bot with necessary configuration.
@@ -30,6 +33,9 @@ def main() -> None:
 
     :raises: Any exception raised during the initialization or the running of the bot will be propagated.
     """
+    logging.basicConfig(level=logging.INFO)
+    record_startup_phase('settings load', SETTINGS_LOAD_SECONDS)
+
     bot = AiogramBot(
         token=str(BOT_TOKEN),
         webhook_url=str(BASE_WEBHOOK_URL),
@@ -41,12 +47,10 @@ def main() -> None:
     # Initialize the database connection
     run(init())
 
-    # POLLING MODE IS ONLY FOR TESTING
-    # Uncomment the line below to run the bot in polling mode for local testing
-    # run(bot.run_polling())
-
-    # Start the bot in webhook mode
-    bot.run_webhook()
+    if BOT_MODE == 'polling':
+        run(bot.run_polling())
+    else:
+        bot.run_webhook()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,162 @@
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.types import TelegramObject
+
+from utils.cache import MISSING
+
+
+class FSMCallStats:
+    """
+    Counters of FSM context calls made by handlers and storage calls actually issued.
+
+    Attributes:
+        context_calls (int): Calls made by handlers and helpers on the FSM context.
+        storage_calls (int): Calls that reached the FSM storage.
+    """
+
+    def __init__(self):
+        self.context_calls = 0
+        self.storage_calls = 0
+
+    @property
+    def saved_calls(self) -> int:
+        return self.context_calls - self.storage_calls
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'context_calls': self.context_calls,
+            'storage_calls': self.storage_calls,
+            'saved_calls': self.saved_calls,
+        }
+
+
+class BufferedFSMContext(FSMContext):
+    """
+    FSM context that loads the state and data at most once and writes them back once.
+
+    Reads and writes during an update work on an in-memory copy, ``flush()``
+    sends the final state and data to the storage if they were changed.
+    """
+
+    def __init__(
+            self,
+            storage: BaseStorage,
+            key: StorageKey,
+            stats: FSMCallStats,
+            state: Any = MISSING,
+    ):
+        """
+        Initializes the context.
+
+        :param storage: FSM storage.
+        :param key: Storage key of the session.
+        :param stats: Counters shared by all buffered contexts.
+        :param state: Already known current state, skips the first storage read.
+        """
+        super().__init__(storage=storage, key=key)
+        self.stats = stats
+        self._state = state
+        self._data: Optional[Dict[str, Any]] = None
+        self._state_changed = False
+        self._data_changed = False
+
+    async def _load_data(self) -> Dict[str, Any]:
+        if self._data is None:
+            self.stats.storage_calls += 1
+            self._data = await self.storage.get_data(key=self.key)
+        return self._data
+
+    async def set_state(self, state: StateType = None) -> None:
+        self.stats.context_calls += 1
+        self._state = state.state if isinstance(state, State) else state
+        self._state_changed = True
+
+    async def get_state(self) -> Optional[str]:
+        self.stats.context_calls += 1
+        if self._state is MISSING:
+            self.stats.storage_calls += 1
+            self._state = await self.storage.get_state(key=self.key)
+        return self._state
+
+    async def set_data(self, data: Dict[str, Any]) -> None:
+        self.stats.context_calls += 1
+        self._data = data.copy()
+        self._data_changed = True
+
+    async def get_data(self) -> Dict[str, Any]:
+        self.stats.context_calls += 1
+        return (await self._load_data()).copy()
+
+    async def get_value(self, key: str, default: Optional[Any] = None) -> Optional[Any]:
+        self.stats.context_calls += 1
+        return (await self._load_data()).get(key, default)
+
+    async def update_data(
+            self, data: Optional[Dict[str, Any]] = None, **kwargs: Any
+    ) -> Dict[str, Any]:
+        self.stats.context_calls += 1
+        if data:
+            kwargs.update(data)
+        current = await self._load_data()
+        current.update(kwargs)
+        self._data_changed = True
+        return current.copy()
+
+    async def clear(self) -> None:
+        await self.set_state(state=None)
+        await self.set_data({})
+
+    async def flush(self) -> None:
+        """
+        Writes the changed state and data to the storage.
+        """
+        if self._state_changed:
+            self.stats.storage_calls += 1
+            await self.storage.set_state(key=self.key, state=self._state)
+            self._state_changed = False
+        if self._data_changed:
+            self.stats.storage_calls += 1
+            await self.storage.set_data(key=self.key, data=self._data)
+            self._data_changed = False
+
+
+class FSMContextCoalescingMiddleware(BaseMiddleware):
+    """
+    Inner update middleware that hands handlers a ``BufferedFSMContext``.
+
+    The state already read by the FSM middleware for state filters is
+    reused, and every change made while handling the update is written
+    with at most one ``set_state`` and one ``set_data`` call at the end.
+
+    Attributes:
+        stats (FSMCallStats): Counters of context and storage calls.
+    """
+
+    def __init__(self):
+        self.stats = FSMCallStats()
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        state: FSMContext | None = data.get('state')
+        if state is None:
+            return await handler(event, data)
+
+        context = BufferedFSMContext(
+            storage=state.storage,
+            key=state.key,
+            stats=self.stats,
+            state=data.get('raw_state', MISSING),
+        )
+        data['state'] = context
+        try:
+            return await handler(event, data)
+        finally:
+            await context.flush()
@@ -0,0 +1,40 @@
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.context import FSMContext
+from aiogram.types import TelegramObject
+
+from database.fsm_storage import SQLiteStorage
+
+logger = logging.getLogger(__name__)
+
+
+class FSMStorageFlushMiddleware(BaseMiddleware):
+    """
+    Outer update middleware that persists FSM changes once the update is handled.
+
+    All ``set_state``/``set_data``/``update_data`` calls made while the
+    update is processed end up in a single ``SQLiteStorage.flush()`` of
+    the session of the update. Sessions of other chats are flushed by
+    their own updates, which may still be running.
+    """
+
+    def __init__(self, storage: SQLiteStorage):
+        self.storage = storage
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        state: FSMContext | None = data.get('state')
+        try:
+            return await handler(event, data)
+        finally:
+            # A failed flush must not replace the exception of the handler.
+            try:
+                await self.storage.flush(keys=[state.key] if state is not None else [])
+            except Exception:
+                logger.exception('Could not flush FSM changes')
@@ -0,0 +1,288 @@
+import asyncio
+import heapq
+import itertools
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import monotonic
+from typing import Any, Iterator
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    CopyMessage,
+    CopyMessages,
+    EditMessageCaption,
+    EditMessageMedia,
+    EditMessageReplyMarkup,
+    EditMessageText,
+    ForwardMessage,
+    ForwardMessages,
+    Response,
+    SendAnimation,
+    SendAudio,
+    SendContact,
+    SendDocument,
+    SendLocation,
+    SendMediaGroup,
+    SendMessage,
+    SendPhoto,
+    SendPoll,
+    SendSticker,
+    SendVenue,
+    SendVideo,
+    SendVideoNote,
+    SendVoice,
+    TelegramMethod,
+)
+from aiogram.methods.base import TelegramType
+
+from utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+BULK = 1
+LANES = {INTERACTIVE: 'interactive', BULK: 'bulk'}
+
+# Lane of the requests made in the current task, see bulk_sending().
+send_priority: ContextVar[int] = ContextVar('send_priority', default=INTERACTIVE)
+
+# Methods that post a new message count against both the global and the chat limit,
+# edits only against the global one.
+SEND_METHODS = (
+    SendMessage,
+    SendPhoto,
+    SendDocument,
+    SendAudio,
+    SendVoice,
+    SendVideo,
+    SendVideoNote,
+    SendAnimation,
+    SendSticker,
+    SendLocation,
+    SendVenue,
+    SendContact,
+    SendPoll,
+    SendMediaGroup,
+    CopyMessage,
+    CopyMessages,
+    ForwardMessage,
+    ForwardMessages,
+)
+EDIT_METHODS = (
+    EditMessageText,
+    EditMessageCaption,
+    EditMessageMedia,
+    EditMessageReplyMarkup,
+)
+
+
+@contextmanager
+def bulk_sending() -> Iterator[None]:
+    """
+    Marks requests made inside the block (and tasks created there) as bulk traffic.
+
+    Bulk requests get global tokens only when no interactive request is waiting.
+    """
+    token = send_priority.set(BULK)
+    try:
+        yield
+    finally:
+        send_priority.reset(token)
+
+
+class TokenBucket:
+    """
+    Token bucket that reserves tokens ahead: a caller that finds the bucket
+    empty takes a future token and sleeps until it is due.
+
+    Attributes:
+        rate (float): Tokens added per second.
+        capacity (float): Maximum number of tokens, i.e. the allowed burst.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = monotonic()
+
+    def _refill(self) -> None:
+        now = monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """
+        Takes a token and returns the number of seconds to wait before using it.
+        """
+        self._refill()
+        self._tokens -= 1
+        return max(0.0, -self._tokens / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Empties the bucket so that the next token is available in ``seconds``.
+        """
+        self._refill()
+        self._tokens = min(self._tokens, 1 - seconds * self.rate)
+
+
+class PriorityTokenBucket(TokenBucket):
+    """
+    Token bucket that hands out tokens to waiters by lane and then in arrival order.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        super().__init__(rate, capacity)
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._dispatcher: asyncio.Task | None = None
+
+    async def acquire(self, priority: int = INTERACTIVE) -> None:
+        self._refill()
+        if not self._waiters and self._tokens >= 1:
+            self._tokens -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    async def _dispatch(self) -> None:
+        while self._waiters:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self._tokens -= 1
+                future.set_result(None)
+
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """
+    Session middleware that paces outgoing messages to Telegram's flood limits.
+
+    Every message goes through a per-chat bucket (one message per second
+    with a small burst in private chats, 20 per minute in groups) and then
+    through the global bucket, where interactive replies are served before
+    bulk sends (see ``bulk_sending``). If Telegram still answers with
+    "retry after", the chat (or the whole bot for chatless methods) is
+    paused for that time and the request is repeated up to ``max_retries``
+    times.
+
+    Attributes:
+        global_bucket (PriorityTokenBucket): Limits messages of the whole bot.
+        chat_rate (float): Messages per second allowed in a private chat.
+        chat_burst (float): Messages a private chat may receive at once.
+        group_rate (float): Messages per second allowed in a group.
+        max_retries (int): Number of repeats after a "retry after" answer.
+    """
+
+    def __init__(
+            self,
+            global_rate: float = 30,
+            chat_rate: float = 1,
+            chat_burst: float = 3,
+            group_rate: float = 20 / 60,
+            max_retries: int = 3,
+            max_chats: int = 10000,
+    ):
+        """
+        Initializes the middleware.
+
+        :param global_rate: Messages per second allowed for the whole bot.
+        :param chat_rate: Messages per second allowed in a private chat.
+        :param chat_burst: Messages a private chat may receive at once.
+        :param group_rate: Messages per second allowed in a group.
+        :param max_retries: Number of repeats after a "retry after" answer.
+        :param max_chats: Number of chat buckets kept in memory.
+        """
+        self.global_bucket = PriorityTokenBucket(rate=global_rate, capacity=global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self._chat_buckets = LRUCache(maxsize=max_chats)
+
+        self.requests = {lane: 0 for lane in LANES}
+        self.throttled = {lane: 0 for lane in LANES}
+        self.throttled_seconds = {lane: 0.0 for lane in LANES}
+        self.retry_after = 0
+        self.retry_after_seconds = 0.0
+
+    def _chat_bucket(self, chat_id: int | str) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            if is_group:
+                bucket = TokenBucket(rate=self.group_rate)
+            else:
+                bucket = TokenBucket(rate=self.chat_rate, capacity=self.chat_burst)
+            self._chat_buckets.set(chat_id, bucket)
+        return bucket
+
+    async def _throttle(self, method: TelegramMethod, chat_id: int | str | None, lane: int) -> None:
+        started = monotonic()
+        if chat_id is not None and isinstance(method, SEND_METHODS):
+            delay = self._chat_bucket(chat_id).reserve()
+            if delay:
+                await asyncio.sleep(delay)
+        await self.global_bucket.acquire(lane)
+
+        waited = monotonic() - started
+        if waited > 0.001:
+            self.throttled[lane] += 1
+            self.throttled_seconds[lane] += waited
+
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType[TelegramType],
+            bot: Bot,
+            method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        if not isinstance(method, SEND_METHODS + EDIT_METHODS):
+            return await make_request(bot, method)
+
+        lane = send_priority.get()
+        chat_id = getattr(method, 'chat_id', None)
+        self.requests[lane] += 1
+        for attempt in range(self.max_retries + 1):
+            await self._throttle(method, chat_id, lane)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as error:
+                if attempt == self.max_retries:
+                    raise
+                self.retry_after += 1
+                self.retry_after_seconds += error.retry_after
+                logger.warning(
+                    'Flood control on %s in chat %s, retrying in %d s',
+                    type(method).__name__, chat_id, error.retry_after,
+                )
+                if chat_id is not None:
+                    self._chat_bucket(chat_id).pause(error.retry_after)
+                else:
+                    self.global_bucket.pause(error.retry_after)
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns the number of paced requests, how many of them waited and for how long, per lane.
+        """
+        return {
+            LANES[lane]: {
+                'requests': self.requests[lane],
+                'throttled': self.throttled[lane],
+                'throttled_seconds': round(self.throttled_seconds[lane], 3),
+            }
+            for lane in LANES
+        } | {
+            'retry_after': self.retry_after,
+            'retry_after_seconds': self.retry_after_seconds,
+        }
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from database.runtime_db_manager import runtime_get, runtime_set
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateWindow:
+    """
+    The last ``size`` update ids seen: a ring buffer for the order plus a set for lookups.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._order: deque[int] = deque()
+        self._ids: set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, update_id: int) -> bool:
+        """
+        Remembers the id, returns False if it was already in the window.
+        """
+        if update_id in self._ids:
+            return False
+        self._ids.add(update_id)
+        self._order.append(update_id)
+        if len(self._order) > self.size:
+            self._ids.discard(self._order.popleft())
+        return True
+
+    def dump(self) -> str:
+        return ','.join(map(str, self._order))
+
+    def load(self, raw: str) -> None:
+        for update_id in raw.split(','):
+            if update_id:
+                self.add(int(update_id))
+
+
+class DuplicateUpdateMiddleware(BaseMiddleware):
+    """
+    Outer update middleware that drops updates Telegram delivered again.
+
+    Telegram repeats an update when the previous delivery was not answered
+    in time, handlers of the join flow and user deletion must not run
+    twice. The window is saved to the runtime state table every
+    ``save_interval`` seconds (if it changed) and on shutdown, so repeats
+    arriving right after a restart are dropped too.
+
+    Attributes:
+        window (UpdateWindow): Ids of the recently seen updates.
+        state_key (str): Runtime state key the window is saved under.
+        save_interval (float): Seconds between two saves of the window.
+        duplicates (int): Number of dropped updates.
+    """
+
+    def __init__(self, size: int = 2000, state_key: str = 'updates:seen', save_interval: float = 5):
+        """
+        Initializes the middleware.
+
+        :param size: Number of update ids remembered.
+        :param state_key: Runtime state key the window is saved under.
+        :param save_interval: Seconds between two saves of the window.
+        """
+        self.window = UpdateWindow(size)
+        self.state_key = state_key
+        self.save_interval = save_interval
+        self.duplicates = 0
+        self._changed = False
+        self._task: asyncio.Task | None = None
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        if isinstance(event, Update):
+            if not self.window.add(event.update_id):
+                self.duplicates += 1
+                logger.info('Skipping duplicate update id=%d', event.update_id)
+                return None
+            self._changed = True
+        return await handler(event, data)
+
+    async def start(self) -> None:
+        """
+        Loads the saved window and starts saving it periodically.
+        """
+        raw = await runtime_get(self.state_key)
+        if raw:
+            self.window.load(raw)
+            logger.info('Loaded %d recent update ids', len(self.window))
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name='update-dedup-saver')
+
+    async def close(self) -> None:
+        """
+        Stops the periodic saving and saves the window.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.save()
+
+    async def save(self) -> None:
+        if not self._changed:
+            return
+        self._changed = False
+        await runtime_set(self.state_key, self.window.dump())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.save_interval)
+            try:
+                await self.save()
+            except Exception:
+                self._changed = True
+                logger.exception('Could not save recent update ids')
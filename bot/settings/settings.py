@@ -1,7 +1,10 @@
 import os
+from time import perf_counter
 
 from dotenv import load_dotenv
 
+_load_started = perf_counter()
+
 dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
 
 if os.path.exists(dotenv_path):
@@ -16,3 +19,56 @@ WEB_SERVER_HOST = os.environ.get('WEB_SERVER_HOST')
 WEB_SERVER_PORT = os.environ.get('WEB_SERVER_PORT')
 WEBHOOK_PATH = os.environ.get('WEBHOOK_PATH')
 BASE_WEBHOOK_URL = os.environ.get('BASE_WEBHOOK_URL')
+
+BOT_MODE = os.environ.get('BOT_MODE', 'webhook')
+POLLING_TIMEOUT = int(os.environ.get('POLLING_TIMEOUT', 30))
+POLLING_LIMIT = int(os.environ.get('POLLING_LIMIT', 100))
+POLLING_HOLD_TIMEOUT = float(os.environ.get('POLLING_HOLD_TIMEOUT', 10))
+
+WEBHOOK_MODE = os.environ.get('WEBHOOK_MODE', 'queue')
+WEBHOOK_STATS_PATH = os.environ.get('WEBHOOK_STATS_PATH')
+WEBHOOK_PROCESSES = int(os.environ.get('WEBHOOK_PROCESSES', 1))
+
+UPDATE_WORKERS = int(os.environ.get('UPDATE_WORKERS', 8))
+UPDATE_MAX_QUEUE = int(os.environ.get('UPDATE_MAX_QUEUE', 1000))
+UPDATE_QUEUE_TIMEOUT = float(os.environ.get('UPDATE_QUEUE_TIMEOUT', 5))
+UPDATE_DEDUP_SIZE = int(os.environ.get('UPDATE_DEDUP_SIZE', 2000))
+
+RATE_LIMIT_GLOBAL = float(os.environ.get('RATE_LIMIT_GLOBAL', 30))
+RATE_LIMIT_CHAT = float(os.environ.get('RATE_LIMIT_CHAT', 1))
+RATE_LIMIT_CHAT_BURST = float(os.environ.get('RATE_LIMIT_CHAT_BURST', 3))
+RATE_LIMIT_GROUP = float(os.environ.get('RATE_LIMIT_GROUP', 20 / 60))
+RATE_LIMIT_MAX_RETRIES = int(os.environ.get('RATE_LIMIT_MAX_RETRIES', 3))
+
+BROADCAST_BATCH_SIZE = int(os.environ.get('BROADCAST_BATCH_SIZE', 100))
+BROADCAST_CONCURRENCY = int(os.environ.get('BROADCAST_CONCURRENCY', 20))
+
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 50))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 8))
+OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', 5))
+
+SCHEDULER_POLL_INTERVAL = float(os.environ.get('SCHEDULER_POLL_INTERVAL', 60))
+SCHEDULER_MAX_ATTEMPTS = int(os.environ.get('SCHEDULER_MAX_ATTEMPTS', 5))
+
+# Hours before Event.expire at which members who did not answer the poll are reminded.
+REMINDER_OFFSETS = [
+    float(hours) for hours in os.environ.get('REMINDER_OFFSETS', '24,3').split(',') if hours.strip()
+]
+
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1024))
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 300))
+
+KEYBOARD_CACHE_SIZE = int(os.environ.get('KEYBOARD_CACHE_SIZE', 256))
+
+SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))
+SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 64 * 1024 * 1024))
+SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE', -16000))
+SQLITE_TEMP_STORE = os.environ.get('SQLITE_TEMP_STORE', 'MEMORY')
+
+FSM_STORAGE = os.environ.get('FSM_STORAGE', 'sqlite')
+FSM_CACHE_SIZE = int(os.environ.get('FSM_CACHE_SIZE', 1024))
+FSM_SESSION_TTL = int(os.environ.get('FSM_SESSION_TTL', 7 * 24 * 60 * 60))
+
+SETTINGS_LOAD_SECONDS = perf_counter() - _load_started
@@ -1,15 +1,69 @@
+import asyncio
+import logging
+import multiprocessing
+from multiprocessing.queues import Queue
+
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 from aiohttp import web
 from tortoise import Tortoise
 
+from database.fsm_storage import SQLiteStorage
+from database.init import init
+from database.users_db_manager import add_user_change_listener, invalidate_all_users, invalidate_user
 from handlers.admin_handler import router as admin_router
 from handlers.cancel_handler import router as cancel_router
 from handlers.join_handler import router as join_router
 from handlers.start_handler import router as start_router
 
+from middlewares.fsm_context import FSMContextCoalescingMiddleware
+from middlewares.fsm_storage import FSMStorageFlushMiddleware
+from middlewares.rate_limit import RateLimitMiddleware
+from middlewares.update_dedup import DuplicateUpdateMiddleware
+from settings.settings import (
+    FSM_STORAGE,
+    FSM_CACHE_SIZE,
+    FSM_SESSION_TTL,
+    WEBHOOK_MODE,
+    UPDATE_WORKERS,
+    UPDATE_MAX_QUEUE,
+    UPDATE_QUEUE_TIMEOUT,
+    WEBHOOK_STATS_PATH,
+    WEBHOOK_PROCESSES,
+    RATE_LIMIT_GLOBAL,
+    RATE_LIMIT_CHAT,
+    RATE_LIMIT_CHAT_BURST,
+    RATE_LIMIT_GROUP,
+    RATE_LIMIT_MAX_RETRIES,
+    BROADCAST_BATCH_SIZE,
+    BROADCAST_CONCURRENCY,
+    OUTBOX_BATCH_SIZE,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_POLL_INTERVAL,
+    SCHEDULER_POLL_INTERVAL,
+    SCHEDULER_MAX_ATTEMPTS,
+    POLLING_TIMEOUT,
+    POLLING_LIMIT,
+    POLLING_HOLD_TIMEOUT,
+    UPDATE_DEDUP_SIZE,
+)
+from utils.broadcaster import Broadcaster
+from utils.callback_router import callback_router
+from utils.event_jobs import event_job_handlers
+from utils.job_scheduler import JobScheduler
+from utils.outbox import OutboxSender, add_enqueue_listener
+from utils.timing import startup_phase
+from utils.sharding import ShardedRequestHandler, relay_worker_events
+from utils.update_poller import UpdatePoller
+from utils.update_scheduler import UpdateScheduler
+from utils.webhook_handler import QueuedRequestHandler
+
+logger = logging.getLogger(__name__)
+
 
 class AiogramBot:
     """
@@ -22,13 +76,28 @@ class AiogramBot:
         host (str): The host on which the application will run.
         port (int): The port on which the application will run.
         bot (Bot): An instance of the aiogram bot.
+        storage (BaseStorage): FSM storage, SQLite-backed unless FSM_STORAGE is set to "memory".
+        update_dedup (DuplicateUpdateMiddleware): Drops updates delivered by Telegram more than once.
+        fsm_context_middleware (FSMContextCoalescingMiddleware): Buffers FSM calls per update
+            and counts the storage round-trips it saved.
         dispatcher (Dispatcher): A dispatcher for handling incoming messages and events.
+        update_scheduler (UpdateScheduler): Processes updates in parallel across chats and in order within a chat.
+        rate_limiter (RateLimitMiddleware): Paces outgoing messages to Telegram's flood limits.
+        broadcaster (Broadcaster): Sends messages to all members, available to handlers as ``broadcaster``.
+        outbox_sender (OutboxSender): Sends the messages queued into the outbox by handlers.
+        job_scheduler (JobScheduler): Runs the jobs of events (reminders, poll closing) when they come due.
+        shard_inboxes (list[Queue]): Inboxes of the worker processes when the webhook is served by several
+            processes, empty otherwise.
+        polling (bool): Whether the bot receives updates by long polling instead of a webhook.
         app (web.Application): An aiohttp web application instance for webhook processing.
 
     Methods:
         __init__(token, webhook_url, webhook_path, host, port):
             Initializes the bot with a token, webhook settings, and application parameters.
 
+        create_storage():
+            Creates the FSM storage selected in the settings.
+
         on_startup():
             Called on application startup. Sets up the webhook for the bot.
 
@@ -46,6 +115,18 @@ class AiogramBot:
 
         setup_webhook():
             Configures webhook handling using aiohttp and connects the dispatcher and bot to the web application.
+
+        handle_rate_limit_stats(request):
+            Returns the outgoing rate limiter statistics.
+
+        handle_fsm_stats(request):
+            Returns the FSM context call statistics.
+
+        run_sharded_webhook(processes):
+            Receives webhooks in this process and handles updates in worker processes sharded by user.
+
+        serve_shard(shard, inbox, events):
+            Handles the updates forwarded to a worker process.
     """
 
     def __init__(
@@ -75,34 +156,120 @@ class AiogramBot:
             token=self.token,
             default=DefaultBotProperties(parse_mode=ParseMode.HTML)
         )
+        # Every worker process sends on its own, and so does the front process (outbox,
+        # scheduled jobs, resumed broadcasts), so they all share the global limit.
+        senders = WEBHOOK_PROCESSES + 1 if WEBHOOK_PROCESSES > 1 else 1
+        self.rate_limiter = RateLimitMiddleware(
+            global_rate=RATE_LIMIT_GLOBAL / senders,
+            chat_rate=RATE_LIMIT_CHAT,
+            chat_burst=RATE_LIMIT_CHAT_BURST,
+            group_rate=RATE_LIMIT_GROUP,
+            max_retries=RATE_LIMIT_MAX_RETRIES,
+        )
+        self.bot.session.middleware(self.rate_limiter)
+
+        self.storage = self.create_storage()
+        self.dispatcher = Dispatcher(storage=self.storage)
+        self.update_dedup = DuplicateUpdateMiddleware(size=UPDATE_DEDUP_SIZE)
+        self.dispatcher.update.outer_middleware(self.update_dedup)
+        if isinstance(self.storage, SQLiteStorage):
+            self.dispatcher.update.outer_middleware(FSMStorageFlushMiddleware(self.storage))
+        self.fsm_context_middleware = FSMContextCoalescingMiddleware()
+        self.dispatcher.update.middleware(self.fsm_context_middleware)
+
+        self.update_scheduler = UpdateScheduler(
+            dispatcher=self.dispatcher,
+            bot=self.bot,
+            workers=UPDATE_WORKERS,
+            max_queue=UPDATE_MAX_QUEUE,
+            put_timeout=UPDATE_QUEUE_TIMEOUT,
+        )
+        self.shard_inboxes: list[Queue] = []
+        self.polling = False
 
-        self.dispatcher = Dispatcher()
+        self.broadcaster = Broadcaster(
+            bot=self.bot,
+            batch_size=BROADCAST_BATCH_SIZE,
+            concurrency=BROADCAST_CONCURRENCY,
+        )
+        self.dispatcher['broadcaster'] = self.broadcaster
+        self.outbox_sender = OutboxSender(
+            bot=self.bot,
+            batch_size=OUTBOX_BATCH_SIZE,
+            max_attempts=OUTBOX_MAX_ATTEMPTS,
+            poll_interval=OUTBOX_POLL_INTERVAL,
+        )
+        self.job_scheduler = JobScheduler(
+            poll_interval=SCHEDULER_POLL_INTERVAL,
+            max_attempts=SCHEDULER_MAX_ATTEMPTS,
+        )
+        for kind, handler in event_job_handlers(self.broadcaster).items():
+            self.job_scheduler.register(kind, handler)
 
         self.app = web.Application()
 
+    @staticmethod
+    def create_storage() -> BaseStorage:
+        """
+        Creates the FSM storage selected by the FSM_STORAGE setting.
+
+        The SQLite storage keeps unfinished questionnaires and admin edit
+        sessions across restarts, the memory storage loses them.
+        """
+        if FSM_STORAGE == 'memory':
+            return MemoryStorage()
+        return SQLiteStorage(cache_size=FSM_CACHE_SIZE, ttl=FSM_SESSION_TTL)
+
     async def on_startup(self) -> None:
         """
         Called on application startup.
 
-        Sets up the webhook for the bot to receive incoming requests.
+        Starts the update workers, the outbox sender and the job scheduler, resumes unfinished broadcasts
+        and sets up the webhook for the bot to receive incoming requests
+        (or removes it in polling mode, Telegram does not serve getUpdates while a webhook is set).
         """
-        await self.bot.set_webhook(
-            f'{self.webhook_url}{self.webhook_path}'
-        )
+        await self.update_dedup.start()
+        if self.polling or WEBHOOK_MODE == 'queue' and not self.shard_inboxes:
+            self.update_scheduler.start()
+        self.outbox_sender.start()
+        self.job_scheduler.start()
+        await self.broadcaster.resume()
+        if self.polling:
+            await self.bot.delete_webhook()
+            return
+        with startup_phase('webhook registration'):
+            await self.bot.set_webhook(
+                f'{self.webhook_url}{self.webhook_path}',
+                allowed_updates=self.dispatcher.resolve_used_update_types()
+            )
 
     async def on_shutdown(self) -> None:
         """
         Called on application shutdown.
 
-        Closes database connections and removes the bot's webhook.
+        Processes the queued updates, stops broadcasts, the outbox sender and the job scheduler,
+        closes database connections
+        and removes the bot's webhook.
         """
+        await self.update_scheduler.close()
+        await self.broadcaster.close()
+        await self.outbox_sender.close()
+        await self.job_scheduler.close()
+        await self.update_dedup.close()
         await Tortoise.close_connections()
-        await self.bot.delete_webhook()
+        if not self.polling:
+            await self.bot.delete_webhook()
+        logger.info('Outgoing rate limit stats: %s', self.rate_limiter.stats())
+        logger.info('FSM call stats: %s', self.fsm_context_middleware.stats.stats())
 
     def setup_routes(self) -> None:
         """
         Registers all routes and handlers for the bot.
+
+        Callback queries of known callback data go through the prefix-indexed `callback_router`
+        before any router filters are checked.
         """
+        callback_router.attach(self.dispatcher)
         self.dispatcher.include_router(cancel_router)
         self.dispatcher.include_router(start_router)
         self.dispatcher.include_router(admin_router)
@@ -129,14 +296,50 @@ class AiogramBot:
         Configures webhook handling using aiohttp.
 
         Registers the dispatcher, bot, and web server to handle incoming requests at the specified webhook path.
+
+        In the "queue" mode (default) Telegram gets an answer as soon as the update is queued into
+        the update scheduler, in the "inline" mode the request is held until the handlers finish.
+        When worker processes are running, updates are forwarded to them instead.
         """
-        webhook_requests_handler = SimpleRequestHandler(
-            dispatcher=self.dispatcher,
-            bot=self.bot,
-        )
+        if self.shard_inboxes:
+            webhook_requests_handler = ShardedRequestHandler(
+                dispatcher=self.dispatcher,
+                bot=self.bot,
+                inboxes=self.shard_inboxes,
+            )
+            if WEBHOOK_STATS_PATH:
+                self.app.router.add_get(WEBHOOK_STATS_PATH, webhook_requests_handler.handle_stats)
+        elif WEBHOOK_MODE == 'queue':
+            webhook_requests_handler = QueuedRequestHandler(
+                dispatcher=self.dispatcher,
+                bot=self.bot,
+                scheduler=self.update_scheduler,
+            )
+            if WEBHOOK_STATS_PATH:
+                self.app.router.add_get(WEBHOOK_STATS_PATH, webhook_requests_handler.handle_stats)
+                self.app.router.add_get(f'{WEBHOOK_STATS_PATH}/rate-limit', self.handle_rate_limit_stats)
+                self.app.router.add_get(f'{WEBHOOK_STATS_PATH}/fsm', self.handle_fsm_stats)
+        else:
+            webhook_requests_handler = SimpleRequestHandler(
+                dispatcher=self.dispatcher,
+                bot=self.bot,
+                handle_in_background=False,
+            )
         webhook_requests_handler.register(self.app, path=self.webhook_path)
         setup_application(self.app, self.dispatcher, bot=self.bot)
 
+    async def handle_rate_limit_stats(self, request: web.Request) -> web.Response:
+        """
+        Returns the outgoing rate limiter statistics as JSON.
+        """
+        return web.json_response(self.rate_limiter.stats())
+
+    async def handle_fsm_stats(self, request: web.Request) -> web.Response:
+        """
+        Returns the counters of FSM context calls and the storage calls they were coalesced into as JSON.
+        """
+        return web.json_response(self.fsm_context_middleware.stats.stats())
+
     def run_webhook(self) -> None:
         """
         Starts the bot using webhook mode.
@@ -145,26 +348,176 @@ class AiogramBot:
         and configures the webhook to handle incoming requests. After the setup, it runs the aiohttp
         application on the specified host and port.
 
+        If WEBHOOK_PROCESSES is greater than one, the updates are handled by worker processes,
+        see `run_sharded_webhook`.
+
         :raises: Any exception raised during the aiohttp server operation will be propagated.
         """
-        self.setup_routes()
+        if WEBHOOK_PROCESSES > 1:
+            self.run_sharded_webhook(WEBHOOK_PROCESSES)
+            return
+
+        with startup_phase('router setup'):
+            self.setup_routes()
         self.startup_register()
         self.shutdown_register()
         self.setup_webhook()
         web.run_app(self.app, host=self.host, port=self.port)
 
+    def run_sharded_webhook(self, processes: int) -> None:
+        """
+        Starts the bot in webhook mode with updates handled by several worker processes.
+
+        This process only receives webhook requests, picks a worker by hashing the user and chat
+        of the update and forwards the raw update to it, so parsing, validation and handlers of
+        different users run on different cores while each user always stays on the same worker.
+        Startup and shutdown hooks (webhook registration and so on) run in this process only.
+        User changes made by a worker are relayed to the other workers to invalidate their caches,
+        and the outbox sender of this process is woken up when a worker queues a message.
+
+        :param processes: Number of worker processes.
+        :raises: Any exception raised during the aiohttp server operation will be propagated.
+        """
+        context = multiprocessing.get_context('spawn')
+        self.shard_inboxes = [context.Queue(maxsize=UPDATE_MAX_QUEUE) for _ in range(processes)]
+        events = context.Queue()
+        workers = [
+            context.Process(
+                target=run_shard_worker,
+                args=(
+                    shard,
+                    self.shard_inboxes[shard],
+                    events,
+                    self.token,
+                    self.webhook_url,
+                    self.webhook_path,
+                    self.host,
+                    self.port,
+                ),
+                name=f'bot-shard-{shard}',
+            )
+            for shard in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        relay_worker_events(events, self.shard_inboxes, self.outbox_sender.wake_threadsafe)
+
+        self.startup_register()
+        self.shutdown_register()
+        self.setup_webhook()
+        try:
+            web.run_app(self.app, host=self.host, port=self.port)
+        finally:
+            for inbox in self.shard_inboxes:
+                inbox.put(None)
+            for worker in workers:
+                worker.join(timeout=30)
+            events.put(None)
+
+    async def serve_shard(self, shard: int, inbox: Queue, events: Queue) -> None:
+        """
+        Runs a worker process of the sharded webhook mode.
+
+        Reads updates forwarded by the front process from the inbox and passes them to the update
+        scheduler until ``None`` is received. A full scheduler blocks the reading, so backpressure
+        reaches the front process through the bounded inbox instead of shedding acknowledged updates.
+
+        :param shard: Index of this worker.
+        :param inbox: Queue with ``('update', update)``, ``('invalidate', telegram_id)`` and
+            ``('invalidate_all', None)`` messages.
+        :param events: Queue this worker reports changed users and queued outbox messages to.
+        """
+        await init()
+        with startup_phase('router setup'):
+            self.setup_routes()
+        self.update_dedup.state_key = f'updates:seen:{shard}'
+        await self.update_dedup.start()
+        self.update_scheduler.start()
+        add_user_change_listener(lambda telegram_id: events.put(('user', shard, telegram_id)))
+        add_enqueue_listener(lambda: events.put(('outbox', shard, None)))
+
+        loop = asyncio.get_running_loop()
+        try:
+            while (message := await loop.run_in_executor(None, inbox.get)) is not None:
+                kind, payload = message
+                if kind == 'update':
+                    # The front process has already answered Telegram, so the update is never
+                    # shed here: while the worker waits the inbox fills up and the front answers 503.
+                    while not await self.update_scheduler.submit(payload):
+                        logger.warning(
+                            'Waiting for the update scheduler to accept update id=%s', payload.get('update_id')
+                        )
+                elif kind == 'invalidate':
+                    invalidate_user(payload)
+                elif kind == 'invalidate_all':
+                    invalidate_all_users()
+        finally:
+            await self.update_scheduler.close()
+            await self.broadcaster.close()
+            await self.update_dedup.close()
+            logger.info('Shard %d outgoing rate limit stats: %s', shard, self.rate_limiter.stats())
+            logger.info('Shard %d FSM call stats: %s', shard, self.fsm_context_middleware.stats.stats())
+            await self.storage.close()
+            await Tortoise.close_connections()
+            await self.bot.session.close()
+
     async def run_polling(self) -> None:
         """
         Starts the bot using polling mode.
 
-        This method sets up all necessary routes, registers the shutdown function, and then starts
-        polling for incoming updates from the Telegram API. It will continuously check for new messages
-        and other events, handling them with the registered handlers.
+        This method sets up all necessary routes, runs the startup hooks (the webhook is removed, the
+        outbox sender and broadcasts are started) and then long polls the Telegram API for updates.
+        Updates are passed to the same update scheduler as in webhook mode, so they are processed in
+        order within a chat and in parallel across chats, with at most UPDATE_MAX_QUEUE updates in flight.
+        The offset is checkpointed in the database, see `UpdatePoller`.
 
-        This method is useful for environments where webhooks cannot be used (e.g., local development).
+        This method is useful for environments where webhooks cannot be used (no public URL).
 
         :raises: Any exception raised during the polling operation will be propagated.
         """
-        self.setup_routes()
+        self.polling = True
+        with startup_phase('router setup'):
+            self.setup_routes()
+        self.startup_register()
         self.shutdown_register()
-        await self.dispatcher.start_polling(self.bot)
+
+        poller = UpdatePoller(
+            bot=self.bot,
+            scheduler=self.update_scheduler,
+            allowed_updates=self.dispatcher.resolve_used_update_types(),
+            timeout=POLLING_TIMEOUT,
+            limit=POLLING_LIMIT,
+            hold_timeout=POLLING_HOLD_TIMEOUT,
+        )
+        await self.dispatcher.emit_startup(bot=self.bot)
+        try:
+            await poller.run()
+        finally:
+            await self.update_scheduler.close()
+            await poller.save_checkpoint()
+            await self.dispatcher.emit_shutdown(bot=self.bot)
+            await self.bot.session.close()
+
+
+def run_shard_worker(
+        shard: int,
+        inbox: Queue,
+        events: Queue,
+        token: str,
+        webhook_url: str,
+        webhook_path: str,
+        host: str,
+        port: int
+) -> None:
+    """
+    Entry point of a worker process started by `AiogramBot.run_sharded_webhook`.
+    """
+    logging.basicConfig(level=logging.INFO)
+    bot = AiogramBot(
+        token=token,
+        webhook_url=webhook_url,
+        webhook_path=webhook_path,
+        host=host,
+        port=port,
+    )
+    asyncio.run(bot.serve_shard(shard, inbox, events))
@@ -0,0 +1,218 @@
+import asyncio
+import logging
+from time import monotonic
+from typing import NamedTuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError
+
+from database.broadcasts_db_manager import (
+    broadcast_advance,
+    broadcast_fail,
+    broadcast_finish,
+    broadcast_get_or_create,
+    broadcast_record_recipient,
+    broadcast_start,
+    get_recipients_batch,
+    get_recorded_user_ids,
+    get_unfinished_broadcasts,
+)
+from database.models import Broadcast
+from middlewares.rate_limit import bulk_sending
+
+logger = logging.getLogger(__name__)
+
+
+class BroadcastReport(NamedTuple):
+    sent: int
+    failed: int
+    blocked: int
+    seconds: float
+
+    @property
+    def per_second(self) -> float:
+        return (self.sent + self.failed + self.blocked) / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f'Доставлено: {self.sent}\n'
+            f'Ошибки: {self.failed}\n'
+            f'Заблокировали бота: {self.blocked}\n'
+            f'Время: {self.seconds:.1f} с ({self.per_second:.1f} сообщ./с)'
+        )
+
+
+class Broadcaster:
+    """
+    Sends a message to every user of a broadcast audience and survives restarts.
+
+    Recipients are read from the database in batches ordered by user id,
+    so memory does not grow with the number of users. Messages of a batch
+    are sent in parallel as bulk traffic of the rate limiter, every
+    delivery is recorded in ``broadcast_recipients`` and the cursor of the
+    broadcast is moved past the batch when it is finished. Unfinished
+    broadcasts are resumed by ``resume`` on startup and skip the
+    recipients already recorded. A broadcast stopped by an unexpected
+    error is marked failed and is sent further only when started again.
+
+    Attributes:
+        bot (Bot): Bot instance the messages are sent with.
+        batch_size (int): Number of recipients read from the database at once.
+        concurrency (int): Number of messages sent in parallel.
+    """
+
+    def __init__(self, bot: Bot, batch_size: int = 100, concurrency: int = 20):
+        """
+        Initializes the broadcaster.
+
+        :param bot: Bot instance the messages are sent with.
+        :param batch_size: Number of recipients read from the database at once.
+        :param concurrency: Number of messages sent in parallel.
+        """
+        self.bot = bot
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self._tasks: dict[int, asyncio.Task] = {}
+
+    async def start(
+            self,
+            key: str,
+            text: str,
+            audience: str = 'members',
+            created_by: int | None = None,
+    ) -> Broadcast:
+        """
+        Creates the broadcast and sends it in the background.
+
+        Starting a broadcast with the key of an existing one does not send it again.
+
+        :param key: Unique key of the broadcast.
+        :param text: Text of the message.
+        :param audience: Name of the recipients filter with its argument, see ``AUDIENCES``.
+        :param created_by: Telegram ID of the admin who gets the report.
+        """
+        broadcast, _ = await broadcast_get_or_create(
+            key=key,
+            text=text,
+            audience=audience,
+            created_by=created_by,
+        )
+        if broadcast.status != 'done':
+            self.spawn(broadcast)
+        return broadcast
+
+    async def resume(self) -> None:
+        """
+        Continues broadcasts interrupted by a restart.
+        """
+        for broadcast in await get_unfinished_broadcasts():
+            logger.info('Resuming broadcast %s from user id %d', broadcast.key, broadcast.cursor)
+            self.spawn(broadcast)
+
+    def spawn(self, broadcast: Broadcast) -> None:
+        if broadcast.id in self._tasks:
+            return
+        task = asyncio.create_task(self.run(broadcast), name=f'broadcast-{broadcast.key}')
+        self._tasks[broadcast.id] = task
+        task.add_done_callback(lambda _: self._finished(broadcast, task))
+
+    def _finished(self, broadcast: Broadcast, task: asyncio.Task) -> None:
+        self._tasks.pop(broadcast.id, None)
+        if task.cancelled() or task.exception() is None:
+            return
+        logger.error('Broadcast %s stopped', broadcast.key, exc_info=task.exception())
+        # Kept in the tasks until marked, so the broadcast is not spawned again meanwhile.
+        failing = asyncio.create_task(self.fail(broadcast), name=f'broadcast-{broadcast.key}-fail')
+        self._tasks[broadcast.id] = failing
+        failing.add_done_callback(lambda _: self._tasks.pop(broadcast.id, None))
+
+    async def fail(self, broadcast: Broadcast) -> None:
+        """
+        Marks the broadcast as failed and tells the admin who started it.
+        """
+        try:
+            await broadcast_fail(broadcast)
+        except Exception:
+            logger.exception('Could not mark broadcast %s as failed', broadcast.key)
+        if broadcast.created_by is None:
+            return
+        try:
+            await self.bot.send_message(
+                chat_id=broadcast.created_by,
+                text=f'Рассылка остановлена из-за ошибки, отправлено до пользователя id {broadcast.cursor}.',
+            )
+        except TelegramAPIError:
+            logger.exception('Could not report the failure of broadcast %s', broadcast.key)
+
+    async def close(self) -> None:
+        """
+        Stops the running broadcasts, they are resumed on the next start.
+        """
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def run(self, broadcast: Broadcast) -> BroadcastReport:
+        """
+        Sends the broadcast to all recipients left and reports the result.
+
+        :param broadcast: Broadcast to send.
+        """
+        started = monotonic()
+        await broadcast_start(broadcast)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def deliver(recipient: dict) -> str:
+            async with semaphore:
+                status = await self.send(recipient['telegram_id'], broadcast.text)
+                await broadcast_record_recipient(broadcast, recipient['id'], status)
+                return status
+
+        with bulk_sending():
+            while batch := await get_recipients_batch(broadcast, self.batch_size):
+                recorded = await get_recorded_user_ids(broadcast, [user['id'] for user in batch])
+                statuses = await asyncio.gather(
+                    *(deliver(user) for user in batch if user['id'] not in recorded)
+                )
+                counters = {'sent': 0, 'failed': 0, 'blocked': 0}
+                for status in statuses:
+                    counters[status] += 1
+                await broadcast_advance(broadcast, batch[-1]['id'], counters)
+
+        await broadcast_finish(broadcast)
+        report = BroadcastReport(
+            sent=broadcast.sent,
+            failed=broadcast.failed,
+            blocked=broadcast.blocked,
+            seconds=monotonic() - started,
+        )
+        logger.info(
+            'Broadcast %s finished: %d sent, %d failed, %d blocked in %.1f s (%.1f msg/s)',
+            broadcast.key, report.sent, report.failed, report.blocked, report.seconds, report.per_second,
+        )
+        await self.report(broadcast, report)
+        return report
+
+    async def send(self, telegram_id: int, text: str) -> str:
+        """
+        Sends one message and returns the recipient status: sent, blocked or failed.
+        """
+        try:
+            await self.bot.send_message(chat_id=telegram_id, text=text)
+        except TelegramForbiddenError:
+            return 'blocked'
+        except TelegramAPIError as error:
+            logger.warning('Broadcast message to %d failed: %s', telegram_id, error)
+            return 'failed'
+        return 'sent'
+
+    async def report(self, broadcast: Broadcast, report: BroadcastReport) -> None:
+        if broadcast.created_by is None:
+            return
+        try:
+            await self.bot.send_message(
+                chat_id=broadcast.created_by,
+                text=f'Рассылка завершена.\n\n{report}',
+            )
+        except TelegramAPIError:
+            logger.exception('Could not send the report of broadcast %s', broadcast.key)
@@ -0,0 +1,103 @@
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Hashable
+
+MISSING = object()
+
+
+class LRUCache:
+    """
+    A bounded in-process cache with least-recently-used eviction and an optional TTL.
+
+    Attributes:
+        maxsize (int): Maximum number of entries kept in the cache.
+        ttl (float | None): Lifetime of an entry in seconds, ``None`` means entries never expire.
+        hits (int): Number of lookups answered from the cache.
+        misses (int): Number of lookups that were not found or had expired.
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None):
+        """
+        Initializes an empty cache.
+
+        :param maxsize: Maximum number of entries kept in the cache.
+        :param ttl: Lifetime of an entry in seconds.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[Any, float | None]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.peek(key) is not MISSING
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Returns the cached value and marks it as recently used.
+
+        :param key: Cache key.
+        :param default: Value returned when the key is missing or expired.
+        """
+        value = self.peek(key)
+        if value is MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def peek(self, key: Hashable) -> Any:
+        """
+        Returns the cached value or ``MISSING`` without touching counters or recency.
+
+        :param key: Cache key.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= monotonic():
+            del self._entries[key]
+            return MISSING
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Stores the value, evicting the least recently used entry when the cache is full.
+
+        :param key: Cache key.
+        :param value: Value to cache.
+        """
+        expires_at = monotonic() + self.ttl if self.ttl is not None else None
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        """
+        Removes the key from the cache if it is present.
+
+        :param key: Cache key.
+        """
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Removes all entries, counters are kept.
+        """
+        self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns hit/miss counters and the current number of entries.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+        }
@@ -0,0 +1,30 @@
+from aiogram.filters.callback_data import CallbackData
+
+
+class AdminMenuCallback(CallbackData, prefix='am'):
+    action: str
+
+
+class UsersPageCallback(CallbackData, prefix='up'):
+    cursor: str | None = None
+    back: bool = False
+
+
+class UserCallback(CallbackData, prefix='u'):
+    telegram_id: int
+    cursor: str | None = None
+
+
+class UserEditCallback(CallbackData, prefix='ue'):
+    field: str
+    telegram_id: int
+
+
+class DeleteUserCallback(CallbackData, prefix='du'):
+    telegram_id: int
+    cursor: str | None = None
+
+
+class ConfirmUserDeletionCallback(CallbackData, prefix='cd'):
+    telegram_id: int
+    cursor: str | None = None
@@ -0,0 +1,81 @@
+from typing import Any, Callable
+
+from aiogram import Router
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import CallbackQuery
+
+SEPARATOR = ':'
+
+
+class CallbackRouter:
+    """
+    Routes callback queries to handlers by the prefix of their ``CallbackData``.
+
+    aiogram checks the filters of callback handlers one by one, so every
+    press is string matched against each handler registered before the
+    right one. Here a press costs one dict lookup by prefix; the callback
+    data is unpacked once and passed to the handler as ``callback_data``.
+    Handlers of one prefix may be told apart by fixed field values, e.g.
+    ``register(AdminMenuCallback, action='users')``.
+    """
+
+    def __init__(self):
+        self._routes: dict[str, list[tuple[type[CallbackData], dict[str, Any], HandlerObject]]] = {}
+
+    def register(self, callback_data: type[CallbackData], **values: Any) -> Callable:
+        """
+        Decorator that registers a handler for the callback data class.
+
+        :param callback_data: Callback data class the handler receives.
+        :param values: Field values the callback data must have.
+        """
+        if callback_data.__separator__ != SEPARATOR:
+            raise ValueError(f'{callback_data.__name__} must use {SEPARATOR!r} as separator')
+
+        def decorator(func: Callable) -> Callable:
+            self._routes.setdefault(callback_data.__prefix__, []).append(
+                (callback_data, values, HandlerObject(callback=func))
+            )
+            return func
+
+        return decorator
+
+    def resolve(self, data: str) -> tuple[CallbackData, HandlerObject] | None:
+        """
+        Returns the unpacked callback data and its handler, or None for unknown data.
+
+        :param data: Callback data of the pressed button.
+        """
+        routes = self._routes.get(data.split(SEPARATOR, 1)[0])
+        if not routes:
+            return None
+        for callback_data, values, handler in routes:
+            try:
+                parsed = callback_data.unpack(data)
+            except (TypeError, ValueError):
+                continue
+            if all(getattr(parsed, field) == value for field, value in values.items()):
+                return parsed, handler
+        return None
+
+    def attach(self, router: Router) -> None:
+        """
+        Registers the routing handler on the router, it should be the first callback handler.
+        """
+        router.callback_query.register(self._dispatch, self._match)
+
+    async def _match(self, callback: CallbackQuery) -> bool | dict[str, Any]:
+        if not callback.data:
+            return False
+        resolved = self.resolve(callback.data)
+        if resolved is None:
+            return False
+        parsed, handler = resolved
+        return {'callback_data': parsed, 'callback_handler': handler}
+
+    async def _dispatch(self, callback: CallbackQuery, callback_handler: HandlerObject, **kwargs: Any) -> Any:
+        return await callback_handler.call(callback, **kwargs)
+
+
+callback_router = CallbackRouter()
@@ -0,0 +1,121 @@
+from bisect import bisect_left, insort
+from heapq import nsmallest
+from typing import NamedTuple
+
+from utils.prefix_trie import PrefixTrie
+
+
+class IndexedUser(NamedTuple):
+    callsign: str
+    telegram_id: int
+    name: str
+
+
+class CallsignIndex:
+    """
+    Listed users (the ones with a name and a callsign) kept sorted by callsign.
+
+    The index is loaded once and then changed in place: a changed user is
+    removed and inserted again with bisect, so a page is a slice of the
+    sorted list and the position of a user is a binary search. Callsigns
+    are unique, so a user is found by ``(callsign,)`` alone. The words of
+    the callsigns and names are kept in a prefix trie for the search.
+
+    Attributes:
+        loaded (bool): Whether the index was filled from the database.
+        stale (set[int]): Telegram ids whose entries must be read from the database again.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self.stale: set[int] = set()
+        self._entries: list[IndexedUser] = []
+        self._by_id: dict[int, IndexedUser] = {}
+        self._words = PrefixTrie()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def load(self, rows: list[tuple[str, int, str]]) -> None:
+        """
+        Replaces the content of the index with the given (callsign, telegram_id, name) rows.
+        """
+        self._entries = sorted(IndexedUser(*row) for row in rows)
+        self._by_id = {entry.telegram_id: entry for entry in self._entries}
+        self._words = PrefixTrie()
+        for entry in self._entries:
+            for word in _words(entry):
+                self._words.add(word, entry.telegram_id)
+        self.loaded = True
+
+    def get(self, telegram_id: int) -> IndexedUser | None:
+        return self._by_id.get(telegram_id)
+
+    def put(self, telegram_id: int, callsign: str | None, name: str | None) -> None:
+        """
+        Inserts or moves the user, a user without a name or a callsign is removed.
+        """
+        self.remove(telegram_id)
+        if not callsign or not name:
+            return
+        entry = IndexedUser(callsign, telegram_id, name)
+        insort(self._entries, entry)
+        self._by_id[telegram_id] = entry
+        for word in _words(entry):
+            self._words.add(word, telegram_id)
+
+    def remove(self, telegram_id: int) -> None:
+        entry = self._by_id.pop(telegram_id, None)
+        if entry is None:
+            return
+        position = bisect_left(self._entries, entry)
+        del self._entries[position]
+        for word in _words(entry):
+            self._words.remove(word, telegram_id)
+
+    def position(self, telegram_id: int) -> int | None:
+        entry = self._by_id.get(telegram_id)
+        if entry is None:
+            return None
+        return bisect_left(self._entries, entry)
+
+    def page(self, cursor: str, limit: int) -> tuple[list[IndexedUser], str | None, str | None]:
+        """
+        Returns the users of the page starting at ``cursor`` with the previous and next cursors.
+
+        :param cursor: Callsign of the first user on the page, an empty string for the first page.
+        :param limit: Number of users on a page.
+        """
+        start = bisect_left(self._entries, (cursor,))
+        users = self._entries[start:start + limit]
+        prev_cursor = self._entries[max(0, start - limit)].callsign if start else None
+        next_cursor = self._entries[start + limit].callsign if start + limit < len(self._entries) else None
+        return users, prev_cursor, next_cursor
+
+    def page_cursor(self, telegram_id: int, limit: int) -> str | None:
+        """
+        Returns the cursor of the page the user is on, pages being counted from the first user.
+        """
+        position = self.position(telegram_id)
+        if position is None:
+            return None
+        start = position - position % limit
+        return self._entries[start].callsign if start else ''
+
+    def search(self, query: str, limit: int) -> list[IndexedUser]:
+        """
+        Returns the users having a word that starts with every word of the query, sorted by callsign.
+
+        :param query: Beginnings of the callsign or name words, in any case and order.
+        :param limit: Maximum number of users returned.
+        """
+        prefixes = query.lower().split()
+        if not prefixes:
+            return []
+        matches = sorted((self._words.search(prefix) for prefix in prefixes), key=len)
+        telegram_ids = set(matches[0]).intersection(*matches[1:])
+        return nsmallest(limit, (self._by_id[telegram_id] for telegram_id in telegram_ids))
+
+
+def _words(entry: IndexedUser) -> set[str]:
+    return {entry.callsign.lower(), *entry.name.lower().split()}
@@ -12,11 +12,15 @@ from database.users_db_manager import user_get_or_none
 CANCEL_REMINDER = answers.get('CANCEL_REMINDER')
 
 
+def is_admin_id(telegram_id: int) -> bool:
+    admins = [int(admin) for admin in str(ADMINS).split(',')]
+    return telegram_id in admins
+
+
 def is_admin(func):
     @wraps(func)
     async def wrapper(message: types.Message, *args, **kwargs):
-        admins = [int(admin) for admin in str(ADMINS).split(',')]
-        if message.from_user.id not in admins:
+        if not is_admin_id(message.from_user.id):
             not_admin = 'Команда доступна только администраторам.'
             await message.answer(not_admin)
             return
@@ -82,11 +86,7 @@ def survey_completion_status(func):
 def check_user_existence(func):
     @wraps(func)
     async def wrapper(callback: types.CallbackQuery, state: FSMContext, *args, **kwargs):
-        try:
-            telegram_id = int(callback.data.split(':')[2])
-        except IndexError:
-            telegram_id = int(callback.data.split(':')[1].split('-')[0])
-        user = await user_get_or_none(telegram_id=telegram_id)
+        user = await user_get_or_none(telegram_id=kwargs['callback_data'].telegram_id)
 
         if not user:
             await callback.answer(
@@ -0,0 +1,98 @@
+import logging
+
+from tortoise import timezone
+
+from database.models import ScheduledJob
+from database.polls_db_manager import get_event_summary
+from settings.settings import ADMINS
+from utils.broadcaster import Broadcaster
+from utils.job_scheduler import JobHandler
+from utils.outbox import enqueue_message
+from utils.ride_matcher import match_event_rides
+
+logger = logging.getLogger(__name__)
+
+
+async def close_event_poll(job: ScheduledJob) -> None:
+    """
+    Closes the poll of an event when it expires, matches passengers with drivers
+    and tells the admins how many members answered.
+
+    The messages go through the outbox with keys made of the job key, so a
+    job run again after a crash does not notify twice.
+    """
+    event = job.event
+    if event is None:
+        return
+    summary = await get_event_summary(event.id)
+    rides = await match_event_rides(event.id)
+    text = (
+        f'Опрос по мероприятию «{event.event_name}» закрыт.\n\n'
+        f'Поедут: {summary.attending}\n'
+        f'Не поедут: {summary.not_attending}\n'
+        f'Водители: {summary.drivers}, мест: {summary.seats}\n\n'
+        f'{rides}'
+    )
+    for admin in str(ADMINS).split(','):
+        await enqueue_message(
+            dedup_key=f'{job.key}:{admin}',
+            chat_id=int(admin),
+            text=text,
+        )
+    logger.info('Poll of event %d closed', event.id)
+
+
+def event_job_handlers(broadcaster: Broadcaster) -> dict[str, JobHandler]:
+    """
+    Returns the handlers of the event jobs by kind.
+
+    :param broadcaster: Broadcaster the announcements and reminders are sent with.
+    """
+
+    async def announce(job: ScheduledJob) -> None:
+        """
+        Tells the members about a new event and asks them to answer its poll.
+
+        The broadcast is keyed by the job, so it is sent once even if the job runs again.
+        """
+        event = job.event
+        if event is None:
+            return
+        await broadcaster.start(
+            key=job.key,
+            text=(
+                f'Новое мероприятие: «{event.event_name}» ({event.organization}).\n'
+                f'Стоимость: {event.price}\n'
+                f'Ответь на опрос до {timezone.localtime(event.expire):%d.%m.%Y %H:%M}.'
+            ),
+            audience='members',
+        )
+
+    async def remind(job: ScheduledJob) -> None:
+        """
+        Reminds the members who did not answer the poll of the event yet.
+
+        The reminder is a broadcast keyed by the job: it is rate limited as
+        bulk traffic, resumed after a restart, and every member it was
+        sent to is recorded, so a reminder is never sent twice.
+        """
+        event = job.event
+        if event is None:
+            return
+        left = event.expire - timezone.now()
+        if left.total_seconds() <= 0:
+            return
+        await broadcaster.start(
+            key=job.key,
+            text=(
+                f'Напоминание: ты еще не ответил на опрос по мероприятию «{event.event_name}». '
+                f'Опрос закроется через {max(1, round(left.total_seconds() / 3600))} ч.'
+            ),
+            audience=f'no_answer:{event.id}',
+        )
+
+    return {
+        'announce': announce,
+        'close_poll': close_event_poll,
+        'remind': remind,
+    }
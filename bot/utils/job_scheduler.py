@@ -0,0 +1,206 @@
+import asyncio
+import heapq
+import logging
+import random
+from datetime import timedelta
+from typing import Awaitable, Callable
+
+from tortoise import timezone
+
+from database.jobs_db_manager import (
+    job_complete,
+    job_fail,
+    job_get_pending,
+    job_retry,
+    jobs_changed_since,
+    jobs_pending,
+)
+from database.models import ScheduledJob
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[ScheduledJob], Awaitable[None]]
+
+# Scheduler of this process, woken up by wake_scheduler.
+_scheduler: 'JobScheduler | None' = None
+
+
+def wake_scheduler() -> None:
+    """
+    Makes the scheduler of this process read the changed jobs right away.
+
+    Jobs saved by other processes are read after at most ``poll_interval``.
+    """
+    if _scheduler is not None:
+        _scheduler.wake()
+
+
+class JobScheduler:
+    """
+    Background task that runs the scheduled jobs when they come due.
+
+    Pending jobs are loaded into a min-heap by ``run_at`` at startup, the
+    task sleeps until the first one is due (or it is woken up) and then
+    runs its handler. Jobs created or moved later are read by their
+    ``updated_at``, so the events table is never scanned. A moved job
+    leaves its old heap entry behind, which is skipped when popped.
+    The job state is kept in the database: a job that was due while the
+    bot was down is run right after the start, a done job is never run
+    again. Failed jobs are retried with exponential backoff and jitter.
+
+    Attributes:
+        poll_interval (float): Seconds between checks for jobs saved by other processes.
+        max_attempts (int): Attempts before a job is marked as failed.
+        base_delay (float): Delay before the first retry in seconds, doubled by every attempt.
+        max_delay (float): Upper bound of the retry delay in seconds.
+    """
+
+    def __init__(
+            self,
+            poll_interval: float = 60,
+            max_attempts: int = 5,
+            base_delay: float = 30,
+            max_delay: float = 60 * 60,
+    ):
+        """
+        Initializes the scheduler, the task is created by ``start``.
+
+        :param poll_interval: Seconds between checks for jobs saved by other processes.
+        :param max_attempts: Attempts before a job is marked as failed.
+        :param base_delay: Delay before the first retry in seconds, doubled by every attempt.
+        :param max_delay: Upper bound of the retry delay in seconds.
+        """
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.handlers: dict[str, JobHandler] = {}
+
+        self._heap: list[tuple[float, int]] = []
+        self._jobs: dict[int, ScheduledJob] = {}
+        self._seen_at = None
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+        self.done = 0
+        self.failed = 0
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        self.handlers[kind] = handler
+
+    def start(self) -> None:
+        global _scheduler
+        if self._task is None:
+            _scheduler = self
+            self._task = asyncio.create_task(self._run(), name='job-scheduler')
+
+    async def close(self) -> None:
+        global _scheduler
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        if _scheduler is self:
+            _scheduler = None
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    def _push(self, job: ScheduledJob) -> None:
+        if job.status != 'pending':
+            self._jobs.pop(job.id, None)
+            return
+        self._jobs[job.id] = job
+        heapq.heappush(self._heap, (job.run_at.timestamp(), job.id))
+
+    async def _load(self) -> None:
+        self._seen_at = timezone.now()
+        for job in await jobs_pending():
+            self._push(job)
+        logger.info('Loaded %d scheduled jobs', len(self._jobs))
+
+    async def _refresh(self) -> None:
+        jobs = await jobs_changed_since(self._seen_at)
+        for job in jobs:
+            known = self._jobs.get(job.id)
+            if known is not None and known.revision == job.revision:
+                continue
+            self._push(job)
+        if jobs:
+            self._seen_at = jobs[-1].updated_at
+
+    def _pop_due(self) -> list[ScheduledJob]:
+        now = timezone.now().timestamp()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            run_at, job_id = heapq.heappop(self._heap)
+            job = self._jobs.get(job_id)
+            if job is None or job.run_at.timestamp() != run_at:
+                continue
+            del self._jobs[job_id]
+            due.append(job)
+        return due
+
+    def _delay(self) -> float:
+        if not self._heap:
+            return self.poll_interval
+        return min(self.poll_interval, max(0.0, self._heap[0][0] - timezone.now().timestamp()))
+
+    async def _run(self) -> None:
+        while self._seen_at is None:
+            try:
+                await self._load()
+            except Exception:
+                logger.exception('Could not load scheduled jobs, retrying')
+                await asyncio.sleep(self.poll_interval)
+        while True:
+            self._wakeup.clear()
+            try:
+                await self._refresh()
+                for job in self._pop_due():
+                    await self.run_job(job)
+            except Exception:
+                logger.exception('Job scheduler failed, retrying')
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._delay())
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_job(self, job: ScheduledJob) -> None:
+        """
+        Runs the handler of a due job and saves the result.
+        """
+        # Read again: the job may have been moved or its event deleted since it was loaded.
+        current = await job_get_pending(job.id)
+        if current is None or current.revision != job.revision:
+            return
+        handler = self.handlers.get(current.kind)
+        try:
+            if handler is None:
+                raise LookupError(f'No handler for {current.kind} jobs')
+            await handler(current)
+        except Exception as exc:
+            current.attempts += 1
+            current.last_error = f'{type(exc).__name__}: {exc}'
+            if current.attempts >= self.max_attempts:
+                logger.error('Job %s failed: %s', current.key, current.last_error)
+                await job_fail(current)
+                self.failed += 1
+                return
+            delay = min(self.max_delay, self.base_delay * 2 ** (current.attempts - 1))
+            current.run_at = timezone.now() + timedelta(seconds=delay * random.uniform(0.5, 1))
+            logger.warning('Job %s failed, retrying at %s: %s', current.key, current.run_at, current.last_error)
+            await job_retry(current)
+            self._push(current)
+            return
+        await job_complete(current)
+        self.done += 1
+        logger.info('Job %s done', current.key)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'scheduled': len(self._jobs),
+            'done': self.done,
+            'failed': self.failed,
+        }
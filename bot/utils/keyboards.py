@@ -1,13 +1,79 @@
+from functools import wraps
+from typing import Any, Callable, Hashable
+
 from aiogram.types import InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
-
-def generate_admin_keyboard(array: list) -> InlineKeyboardMarkup:
+from settings.settings import KEYBOARD_CACHE_SIZE
+from utils.cache import LRUCache, MISSING
+from utils.callback_data import (
+    AdminMenuCallback,
+    ConfirmUserDeletionCallback,
+    DeleteUserCallback,
+    UserCallback,
+    UserEditCallback,
+    UsersPageCallback,
+)
+
+# Rendered markups by (builder, arguments), markups are never modified
+# after they are built, so one instance is shared by all messages.
+keyboard_cache = LRUCache(maxsize=KEYBOARD_CACHE_SIZE)
+
+
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, dict):
+        return tuple((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def memoized_keyboard(key: Callable[..., Hashable] | None = None):
+    """
+    Caches the markups returned by a keyboard builder.
+
+    By default the cache key is made of all the arguments, ``key`` replaces
+    it for builders that get data which is expensive to compare, e.g. a
+    list of users that is identified by a data version instead.
+
+    :param key: Function of the builder arguments returning the cache key.
+    """
+    def decorator(builder: Callable[..., InlineKeyboardMarkup]) -> Callable[..., InlineKeyboardMarkup]:
+        @wraps(builder)
+        def wrapper(*args, **kwargs) -> InlineKeyboardMarkup:
+            if key is not None:
+                arguments = key(*args, **kwargs)
+            else:
+                arguments = (_freeze(args), _freeze(sorted(kwargs.items())))
+            cache_key = (builder.__name__, arguments)
+            markup = keyboard_cache.get(cache_key, MISSING)
+            if markup is MISSING:
+                markup = builder(*args, **kwargs)
+                keyboard_cache.set(cache_key, markup)
+            return markup
+
+        return wrapper
+
+    return decorator
+
+
+def _users_page_key(
+        users: list,
+        version: int,
+        cursor: str = '',
+        prev_cursor: str | None = None,
+        next_cursor: str | None = None
+) -> Hashable:
+    return version, cursor, prev_cursor, next_cursor
+
+
+@memoized_keyboard()
+def generate_admin_keyboard(buttons: dict[str, str]) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    for index in array:
+    for text, action in buttons.items():
         builder.button(
-            text=str(index),
-            callback_data=f'admin:{str(index).split(" ")[0].lower()}'
+            text=text,
+            callback_data=AdminMenuCallback(action=action)
         )
 
     builder.adjust(2, 1, 1)
@@ -15,35 +81,38 @@ def generate_admin_keyboard(array: list) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def generate_all_users_keyboard(users: list, page: int = 1) -> InlineKeyboardMarkup:
+@memoized_keyboard(key=_users_page_key)
+def generate_all_users_keyboard(
+        users: list,
+        version: int,
+        cursor: str = '',
+        prev_cursor: str | None = None,
+        next_cursor: str | None = None
+) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
 
-    start_index = (page - 1) * 9
-    end_index = start_index + 9
-    user_buttons = users[start_index:end_index]
-
-    for user in user_buttons:
+    for user in users:
         callsign = user.get('callsign')
         telegram_id = user.get('telegram_id')
         builder.button(
             text=callsign.capitalize(),
-            callback_data=f'user:{telegram_id}-{page}'
+            callback_data=UserCallback(telegram_id=telegram_id, cursor=cursor)
         )
 
     nav_buttons = []
-    if page > 1:
-        nav_buttons.append(("<<", f'users_page-{page - 1}'))
-    if end_index < len(users):
-        nav_buttons.append((">>", f'users_page-{page + 1}'))
+    if prev_cursor is not None:
+        nav_buttons.append(("<<", UsersPageCallback(cursor=prev_cursor)))
+    if next_cursor is not None:
+        nav_buttons.append((">>", UsersPageCallback(cursor=next_cursor)))
 
     for text, callback_data in nav_buttons:
         builder.button(text=text, callback_data=callback_data)
 
-    builder.button(text='В админ меню', callback_data='back:админ')
+    builder.button(text='В админ меню', callback_data=AdminMenuCallback(action='menu'))
 
-    rows = [3] * (len(user_buttons) // 3)
-    if len(user_buttons) % 3 > 0:
-        rows.append(len(user_buttons) % 3)
+    rows = [3] * (len(users) // 3)
+    if len(users) % 3 > 0:
+        rows.append(len(users) % 3)
     if nav_buttons:
         rows.append(len(nav_buttons))
     rows.append(1)
@@ -53,29 +122,58 @@ def generate_all_users_keyboard(users: list, page: int = 1) -> InlineKeyboardMar
     return builder.as_markup()
 
 
-def generate_edit_user_keyboard(telegram_id: int, page: int, array: list) -> InlineKeyboardMarkup:
+def generate_found_users_keyboard(users: list) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+
+    for user in users:
+        builder.button(
+            text=f"{user.get('callsign').capitalize()} ({user.get('name').title()})",
+            callback_data=UserCallback(telegram_id=user.get('telegram_id'))
+        )
+
+    builder.button(text='В админ меню', callback_data=AdminMenuCallback(action='menu'))
+    builder.adjust(1)
+
+    return builder.as_markup()
+
+
+@memoized_keyboard()
+def generate_edit_user_keyboard(telegram_id: int, cursor: str, buttons: dict[str, str]) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
 
-    for index in array:
+    for text, field in buttons.items():
         builder.button(
-            text=index,
-            callback_data=f'user_edit:{index.split()[1]}:{telegram_id}'
+            text=text,
+            callback_data=UserEditCallback(field=field, telegram_id=telegram_id)
         )
 
-    builder.button(text='Удалить пользователя', callback_data=f'delete_user:{telegram_id}-{page}')
-    builder.button(text='Назад к пользователям', callback_data=f'back:users_page-{page}')
-    builder.button(text='В админ меню', callback_data='back:админ')
+    builder.button(
+        text='Удалить пользователя',
+        callback_data=DeleteUserCallback(telegram_id=telegram_id, cursor=cursor)
+    )
+    builder.button(
+        text='Назад к пользователям',
+        callback_data=UsersPageCallback(cursor=cursor, back=True)
+    )
+    builder.button(text='В админ меню', callback_data=AdminMenuCallback(action='menu'))
 
     builder.adjust(3, 2, 1, 1, 1)
 
     return builder.as_markup()
 
 
-def generate_delete_user_keyboard(telegram_id: int, page: int) -> InlineKeyboardMarkup:
+@memoized_keyboard()
+def generate_delete_user_keyboard(telegram_id: int, cursor: str) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
 
-    builder.button(text='Да', callback_data=f'confirm_user_deletion:{telegram_id}-{page}')
-    builder.button(text='Нет', callback_data=f'user:{telegram_id}-{page}')
+    builder.button(
+        text='Да',
+        callback_data=ConfirmUserDeletionCallback(telegram_id=telegram_id, cursor=cursor)
+    )
+    builder.button(
+        text='Нет',
+        callback_data=UserCallback(telegram_id=telegram_id, cursor=cursor)
+    )
 
     builder.adjust(2)
 
@@ -83,6 +181,13 @@ def generate_delete_user_keyboard(telegram_id: int, page: int) -> InlineKeyboard
 
 
 def generate_back_to_admin_keyboard() -> InlineKeyboardMarkup:
+    return BACK_TO_ADMIN_KEYBOARD
+
+
+def _build_back_to_admin_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    builder.button(text='В админ меню', callback_data=f'back:админ')
+    builder.button(text='В админ меню', callback_data=AdminMenuCallback(action='menu'))
     return builder.as_markup()
+
+
+BACK_TO_ADMIN_KEYBOARD = _build_back_to_admin_keyboard()
@@ -0,0 +1,261 @@
+import asyncio
+import json
+import logging
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Callable
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+from aiogram.types import ForceReply, InlineKeyboardMarkup, ReplyKeyboardMarkup, ReplyKeyboardRemove
+from tortoise import timezone
+
+from database.models import OutboxMessage
+from database.outbox_db_manager import (
+    outbox_complete,
+    outbox_due,
+    outbox_enqueue,
+    outbox_next_attempt_at,
+    outbox_purge,
+)
+
+logger = logging.getLogger(__name__)
+
+ReplyMarkup = InlineKeyboardMarkup | ReplyKeyboardMarkup | ReplyKeyboardRemove | ForceReply
+
+# Sender of this process, woken up by enqueue_message.
+_sender: 'OutboxSender | None' = None
+
+# Called after a message is queued in a process without a sender, lets a
+# worker process wake the sender of the front process.
+enqueue_listeners: list[Callable[[], None]] = []
+
+
+def add_enqueue_listener(listener: Callable[[], None]) -> None:
+    enqueue_listeners.append(listener)
+
+
+async def enqueue_message(
+        dedup_key: str,
+        chat_id: int,
+        text: str,
+        reply_markup: ReplyMarkup | None = None,
+) -> None:
+    """
+    Queues a message to be sent by the outbox sender.
+
+    The message is stored in the database, so it is sent even if Telegram
+    is slow or the bot restarts. A second message with the same dedup key
+    (e.g. from a redelivered update) is ignored.
+
+    :param dedup_key: Unique key of the message.
+    :param chat_id: Chat the message is sent to.
+    :param text: Text of the message.
+    :param reply_markup: Keyboard attached to the message.
+    """
+    await outbox_enqueue(
+        dedup_key=dedup_key,
+        chat_id=chat_id,
+        text=text,
+        reply_markup=reply_markup.model_dump_json(exclude_none=True) if reply_markup else None,
+    )
+    if _sender is not None:
+        _sender.wake()
+        return
+    for listener in enqueue_listeners:
+        listener()
+
+
+class OutboxSender:
+    """
+    Background task that sends the queued outbox messages.
+
+    Due messages are read in batches, messages of different chats are sent
+    in parallel and messages of one chat in the order they were queued.
+    Temporary failures (network, 5xx, flood control) are retried with
+    exponential backoff and jitter, permanent ones (blocked bot, bad
+    request) and messages out of attempts go to the dead letter table.
+
+    Attributes:
+        bot (Bot): Bot instance the messages are sent with.
+        batch_size (int): Number of messages read at once.
+        max_attempts (int): Attempts before a message goes to the dead letter table.
+        base_delay (float): Delay before the first retry in seconds, doubled by every attempt.
+        max_delay (float): Upper bound of the retry delay in seconds.
+        poll_interval (float): Seconds between checks for messages queued by other processes.
+        retention (timedelta): Time sent and dead messages are kept for deduplication.
+        purge_interval (timedelta): Minimal time between two purges of old messages.
+    """
+
+    def __init__(
+            self,
+            bot: Bot,
+            batch_size: int = 50,
+            max_attempts: int = 8,
+            base_delay: float = 2,
+            max_delay: float = 15 * 60,
+            poll_interval: float = 5,
+            retention: int = 7 * 24 * 60 * 60,
+            purge_interval: int = 60 * 60,
+    ):
+        """
+        Initializes the sender, the task is created by ``start``.
+
+        :param bot: Bot instance the messages are sent with.
+        :param batch_size: Number of messages read at once.
+        :param max_attempts: Attempts before a message goes to the dead letter table.
+        :param base_delay: Delay before the first retry in seconds, doubled by every attempt.
+        :param max_delay: Upper bound of the retry delay in seconds.
+        :param poll_interval: Seconds between checks for messages queued by other processes.
+        :param retention: Seconds sent and dead messages are kept for deduplication.
+        :param purge_interval: Minimal time in seconds between two purges of old messages.
+        """
+        self.bot = bot
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.retention = timedelta(seconds=retention)
+        self.purge_interval = timedelta(seconds=purge_interval)
+        self._last_purge: datetime | None = None
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+        self.sent = 0
+        self.retried = 0
+        self.dead = 0
+
+    def start(self) -> None:
+        global _sender
+        if self._task is None:
+            _sender = self
+            self._loop = asyncio.get_running_loop()
+            self._task = asyncio.create_task(self._run(), name='outbox-sender')
+
+    async def close(self) -> None:
+        global _sender
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        if _sender is self:
+            _sender = None
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    def wake_threadsafe(self) -> None:
+        """
+        Wakes the sender from another thread, does nothing before it is started.
+        """
+        if self._loop is not None and self._task is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _purge(self) -> None:
+        now = timezone.now()
+        if self._last_purge is not None and now - self._last_purge <= self.purge_interval:
+            return
+        self._last_purge = now
+        purged = await outbox_purge(self.retention)
+        if purged:
+            logger.info('Purged %d old outbox messages', purged)
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                await self._purge()
+                batch = await outbox_due(self.batch_size)
+                if batch:
+                    await self.send_batch(batch)
+                    continue
+                delay = self.poll_interval
+                next_attempt_at = await outbox_next_attempt_at()
+                if next_attempt_at is not None:
+                    delay = min(delay, max(0.0, (next_attempt_at - timezone.now()).total_seconds()))
+            except Exception:
+                logger.exception('Outbox sender failed, retrying')
+                delay = self.poll_interval
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def send_batch(self, batch: list[OutboxMessage]) -> None:
+        """
+        Sends a batch of due messages and saves the results.
+        """
+        chats: dict[int, list[OutboxMessage]] = defaultdict(list)
+        for message in batch:
+            chats[message.chat_id].append(message)
+
+        sent, retried, dead = [], [], []
+
+        async def send_chat(messages: list[OutboxMessage]) -> None:
+            for position, message in enumerate(messages):
+                error = await self.send(message)
+                if error is None:
+                    sent.append(message)
+                    continue
+                self._fail(message, error, retried, dead)
+                # Keep the order of the chat: the next messages wait for this one.
+                for later in messages[position + 1:]:
+                    later.next_attempt_at = message.next_attempt_at
+                    retried.append(later)
+                return
+
+        await asyncio.gather(*(send_chat(messages) for messages in chats.values()))
+        await outbox_complete(sent=sent, retried=retried, dead=dead)
+        self.sent += len(sent)
+        self.dead += len(dead)
+
+    async def send(self, message: OutboxMessage) -> TelegramAPIError | None:
+        try:
+            await self.bot.send_message(
+                chat_id=message.chat_id,
+                text=message.text,
+                reply_markup=json.loads(message.reply_markup) if message.reply_markup else None,
+            )
+        except TelegramAPIError as error:
+            return error
+        return None
+
+    def _fail(
+            self,
+            message: OutboxMessage,
+            error: TelegramAPIError,
+            retried: list[OutboxMessage],
+            dead: list[OutboxMessage],
+    ) -> None:
+        message.attempts += 1
+        message.last_error = f'{type(error).__name__}: {error}'
+        temporary = isinstance(error, (TelegramRetryAfter, TelegramServerError, TelegramNetworkError))
+        if not temporary or message.attempts >= self.max_attempts:
+            logger.warning('Outbox message %s is dead: %s', message.dedup_key, message.last_error)
+            dead.append(message)
+            return
+
+        if isinstance(error, TelegramRetryAfter):
+            delay = error.retry_after
+        else:
+            delay = min(self.max_delay, self.base_delay * 2 ** (message.attempts - 1))
+            delay *= random.uniform(0.5, 1)
+        message.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+        retried.append(message)
+        self.retried += 1
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'sent': self.sent,
+            'retried': self.retried,
+            'dead': self.dead,
+        }
@@ -0,0 +1,58 @@
+from typing import Hashable
+
+
+class _Node:
+    __slots__ = ('children', 'keys')
+
+    def __init__(self):
+        self.children: dict[str, _Node] = {}
+        # Keys of all the words that pass through this node.
+        self.keys: set[Hashable] = set()
+
+
+class PrefixTrie:
+    """
+    Maps words to keys and finds the keys of all words starting with a prefix.
+
+    Every node keeps the keys of the words below it, so a lookup walks
+    ``len(prefix)`` nodes and does not visit the subtree. The same word may
+    belong to several keys and a key to several words.
+    """
+
+    def __init__(self):
+        self._root = _Node()
+
+    def add(self, word: str, key: Hashable) -> None:
+        node = self._root
+        node.keys.add(key)
+        for char in word:
+            node = node.children.setdefault(char, _Node())
+            node.keys.add(key)
+
+    def remove(self, word: str, key: Hashable) -> None:
+        """
+        Removes the key from the word, nodes left without keys are dropped.
+        """
+        path = [self._root]
+        for char in word:
+            node = path[-1].children.get(char)
+            if node is None:
+                return
+            path.append(node)
+        for node in path:
+            node.keys.discard(key)
+        for depth in range(len(word), 0, -1):
+            if path[depth].keys:
+                break
+            del path[depth - 1].children[word[depth - 1]]
+
+    def search(self, prefix: str) -> set[Hashable]:
+        """
+        Returns the keys of the words starting with ``prefix``, the returned set must not be changed.
+        """
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return set()
+        return node.keys
@@ -0,0 +1,146 @@
+import logging
+from typing import Any, NamedTuple
+
+import numpy as np
+
+from database.rides_db_manager import get_attending_polls, rides_replace
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0
+
+
+class RideMatch(NamedTuple):
+    rides: list[tuple[int, int]]
+    drivers: int
+    passengers: int
+    unmatched: list[int]
+    unlocated_drivers: list[int]
+
+    def __str__(self) -> str:
+        text = (
+            f'Подвезут: {len(self.rides)} из {self.passengers}\n'
+            f'Водители с адресом: {self.drivers}\n'
+            f'Без машины: {len(self.unmatched)}'
+        )
+        if self.unlocated_drivers:
+            text += f'\nВодители без адреса: {len(self.unlocated_drivers)}'
+        return text
+
+
+def parse_location(text: str | None) -> tuple[float, float] | None:
+    """
+    Parses a start location given as "latitude, longitude", returns None for anything else.
+    """
+    if not text:
+        return None
+    parts = text.replace(';', ',').split(',')
+    if len(parts) != 2:
+        return None
+    try:
+        latitude, longitude = float(parts[0]), float(parts[1])
+    except ValueError:
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    return latitude, longitude
+
+
+def haversine_matrix(origins: np.ndarray, destinations: np.ndarray) -> np.ndarray:
+    """
+    Returns the great-circle distances in kilometres between every origin and every destination.
+
+    :param origins: Array of shape (n, 2) with latitudes and longitudes in degrees.
+    :param destinations: Array of shape (m, 2) with latitudes and longitudes in degrees.
+    :return: Array of shape (n, m).
+    """
+    origins = np.radians(origins)[:, np.newaxis, :]
+    destinations = np.radians(destinations)[np.newaxis, :, :]
+    delta = destinations - origins
+    a = (
+        np.sin(delta[..., 0] / 2) ** 2
+        + np.cos(origins[..., 0]) * np.cos(destinations[..., 0]) * np.sin(delta[..., 1] / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def assign_passengers(distances: np.ndarray, capacities: np.ndarray) -> list[tuple[int, int]]:
+    """
+    Greedily assigns passengers to drivers, the closest pairs first, without exceeding car capacities.
+
+    :param distances: Array of shape (passengers, drivers).
+    :param capacities: Free seats of every driver.
+    :return: (passenger index, driver index) pairs.
+    """
+    passengers, drivers = distances.shape
+    if not passengers or not drivers:
+        return []
+    seats = capacities.astype(np.int64, copy=True)
+    assigned = np.zeros(passengers, dtype=bool)
+    pairs = []
+    seats_left = int(seats.sum())
+    for flat in np.argsort(distances, axis=None, kind='stable'):
+        if not seats_left or len(pairs) == passengers:
+            break
+        passenger, driver = divmod(int(flat), drivers)
+        if assigned[passenger] or seats[driver] <= 0:
+            continue
+        assigned[passenger] = True
+        seats[driver] -= 1
+        seats_left -= 1
+        pairs.append((passenger, driver))
+    return pairs
+
+
+def match_rides(polls: list[dict[str, Any]]) -> RideMatch:
+    """
+    Splits the attending polls into drivers and passengers and matches them by pickup distance.
+
+    Drivers are the members who can give a ride and have free seats,
+    everyone else attending is a passenger. Passengers without a parsable
+    start location can not be matched and are returned as unmatched,
+    drivers without one are returned as unlocated drivers.
+    """
+    drivers, driver_points, capacities, unlocated_drivers = [], [], [], []
+    passengers, passenger_points, unlocated = [], [], []
+    for poll in polls:
+        location = parse_location(poll['start_location'])
+        if poll['can_provide_ride'] and (poll['car_capacity'] or 0) > 0:
+            if location is None:
+                unlocated_drivers.append(poll['user_id'])
+            else:
+                drivers.append(poll['user_id'])
+                driver_points.append(location)
+                capacities.append(poll['car_capacity'])
+        elif location is None:
+            unlocated.append(poll['user_id'])
+        else:
+            passengers.append(poll['user_id'])
+            passenger_points.append(location)
+
+    pairs = []
+    if passengers and drivers:
+        distances = haversine_matrix(np.array(passenger_points), np.array(driver_points))
+        pairs = assign_passengers(distances, np.array(capacities))
+    matched = {passenger for passenger, _ in pairs}
+
+    return RideMatch(
+        rides=[(drivers[driver], passengers[passenger]) for passenger, driver in pairs],
+        drivers=len(drivers),
+        passengers=len(passengers) + len(unlocated),
+        unmatched=unlocated + [user_id for index, user_id in enumerate(passengers) if index not in matched],
+        unlocated_drivers=unlocated_drivers,
+    )
+
+
+async def match_event_rides(event_id: int) -> RideMatch:
+    """
+    Matches the passengers of an event with its drivers and replaces the saved rides.
+    """
+    match = match_rides(await get_attending_polls(event_id))
+    await rides_replace(event_id, match.rides)
+    logger.info(
+        'Rides of event %d: %d matched, %d unmatched, %d drivers, %d drivers without a location',
+        event_id, len(match.rides), len(match.unmatched), match.drivers, len(match.unlocated_drivers),
+    )
+    return match
@@ -0,0 +1,142 @@
+import logging
+import queue
+import threading
+import zlib
+from multiprocessing.queues import Queue
+from typing import Any, Callable
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+from aiohttp import web
+
+from utils.update_scheduler import update_order_key
+
+logger = logging.getLogger(__name__)
+
+# Seconds between attempts to deliver a full cache drop to a worker with a full inbox.
+RELAY_RETRY_INTERVAL = 0.5
+
+
+def shard_for(update: dict[str, Any], shards: int) -> int:
+    """
+    Returns the index of the worker process responsible for the update.
+
+    The shard depends only on the conversation key, so every update of a
+    user lands on the same worker, which keeps its FSM session cache and
+    update ordering valid. crc32 is used instead of ``hash`` because it is
+    stable between processes and restarts.
+
+    :param update: Raw update received from Telegram.
+    :param shards: Number of worker processes.
+    """
+    key = update_order_key(update)
+    return zlib.crc32(repr(key).encode()) % shards
+
+
+class ShardedRequestHandler(SimpleRequestHandler):
+    """
+    Webhook handler of the front process that forwards raw updates to worker processes.
+
+    Only the JSON body is parsed here, validation and handling happen in
+    the worker chosen by ``shard_for``. A full worker inbox is answered
+    with 503 so Telegram redelivers the update later.
+    """
+
+    def __init__(
+            self,
+            dispatcher: Dispatcher,
+            bot: Bot,
+            inboxes: list[Queue],
+            secret_token: str | None = None,
+            **data: Any
+    ):
+        """
+        Initializes the handler.
+
+        :param dispatcher: Dispatcher of the front process, runs startup and shutdown hooks only.
+        :param bot: Bot instance of the front process.
+        :param inboxes: Inbox queue of every worker process, indexed by shard.
+        :param secret_token: Expected X-Telegram-Bot-Api-Secret-Token header value.
+        """
+        super().__init__(
+            dispatcher=dispatcher,
+            bot=bot,
+            handle_in_background=True,
+            secret_token=secret_token,
+            **data
+        )
+        self.inboxes = inboxes
+        self.forwarded = [0] * len(inboxes)
+        self.shed = 0
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        update = await request.json(loads=bot.session.json_loads)
+        shard = shard_for(update, len(self.inboxes))
+        try:
+            self.inboxes[shard].put_nowait(('update', update))
+        except queue.Full:
+            self.shed += 1
+            logger.warning('Worker %d inbox is full, update id=%s is shed', shard, update.get('update_id'))
+            return web.Response(status=503, text='Update queue is full')
+        self.forwarded[shard] += 1
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        """
+        Returns the number of updates forwarded to every worker and the number of shed updates.
+        """
+        return web.json_response({'forwarded': self.forwarded, 'shed': self.shed})
+
+
+def relay_worker_events(events: Queue, inboxes: list[Queue], wake_outbox: Callable[[], None]) -> threading.Thread:
+    """
+    Starts a thread that forwards the notifications of the worker processes.
+
+    Workers put ``('user', shard, telegram_id)`` into ``events`` whenever
+    they change a user, every other worker receives ``('invalidate', telegram_id)``
+    and drops its cached copies. ``('outbox', shard, None)`` means that a
+    worker queued an outbox message, ``wake_outbox`` wakes the sender of the
+    front process so the message does not wait for its next poll.
+    ``None`` in ``events`` stops the thread.
+
+    The relay never blocks on a full inbox, otherwise a busy worker would
+    stall the notifications of all the others. A notification that does not
+    fit is replaced by ``('invalidate_all', None)``, delivered as soon as the
+    inbox has room, and the worker drops all its cached users.
+
+    :param events: Queue the workers report to.
+    :param inboxes: Inbox queue of every worker process, indexed by shard.
+    :param wake_outbox: Wakes the outbox sender, called from the relay thread.
+    """
+    def deliver(shard: int, message: tuple[str, Any]) -> bool:
+        try:
+            inboxes[shard].put_nowait(message)
+        except queue.Full:
+            return False
+        return True
+
+    def relay() -> None:
+        dropped: set[int] = set()
+        while True:
+            try:
+                event = events.get(timeout=RELAY_RETRY_INTERVAL if dropped else None)
+            except queue.Empty:
+                event = ()
+            if event is None:
+                return
+            # A pending full drop supersedes the single invalidations.
+            dropped = {shard for shard in dropped if not deliver(shard, ('invalidate_all', None))}
+            if not event:
+                continue
+            kind, source, telegram_id = event
+            if kind == 'outbox':
+                wake_outbox()
+                continue
+            for shard in range(len(inboxes)):
+                if shard != source and shard not in dropped and not deliver(shard, ('invalidate', telegram_id)):
+                    logger.warning('Worker %d inbox is full, its user cache will be dropped', shard)
+                    dropped.add(shard)
+
+    thread = threading.Thread(target=relay, name='worker-event-relay', daemon=True)
+    thread.start()
+    return thread
@@ -4,20 +4,51 @@ from aiogram import types
 from aiogram.fsm.context import FSMContext
 
 
+# Telegram splits a pasted text longer than 4096 characters into several
+# messages, every part except the last one is longer than this threshold.
+MESSAGE_PART_THRESHOLD = 4000
+
+# Longest answer worth keeping for an FSM key. Validators reject anything
+# longer, so one extra character is enough to keep the answer invalid.
+MESSAGE_PART_LIMITS = {
+    'name': 100,
+    'new_name': 100,
+    'callsign': 10,
+    'new_callsign': 10,
+    'age': 10,
+    'new_age': 10,
+    'about': 1000,
+    'experience': 1000,
+}
+DEFAULT_MESSAGE_PART_LIMIT = 4096
+
+
 async def merge_message_parts(
         message: types.Message,
         state: FSMContext,
         key: str,
 ) -> bool | str:
-    data = await state.get_data()
-    data_text = data.get(key, '')
     text = message.text
-    if len(text) > 4000:
-        data_text += f' {text}'
-        await state.update_data(**{key: data_text})
+    parts_key = f'{key}_parts'
+    limit = MESSAGE_PART_LIMITS.get(key, DEFAULT_MESSAGE_PART_LIMIT) + 1
+    parts = await state.get_value(parts_key) or []
+
+    if len(text) > MESSAGE_PART_THRESHOLD:
+        stored = sum(len(part) + 1 for part in parts)
+        if stored < limit:
+            parts.append(text[:limit - stored])
+            await state.update_data(**{parts_key: parts})
         return False
 
-    return f'{data_text} {text}'.strip()
+    if not parts:
+        return text.strip()
+
+    data = await state.get_data()
+    data.pop(parts_key, None)
+    await state.set_data(data)
+
+    parts.append(text)
+    return ' '.join(parts).strip()[:limit]
 
 
 def calculate_age(birth_date: datetime) -> int:
@@ -0,0 +1,34 @@
+import logging
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+# Duration of every startup phase in seconds, in the order they finished.
+STARTUP_PHASES: dict[str, float] = {}
+
+
+def record_startup_phase(name: str, seconds: float) -> None:
+    """
+    Stores and logs the duration of a startup phase.
+
+    :param name: Human-readable name of the phase.
+    :param seconds: Duration of the phase in seconds.
+    """
+    STARTUP_PHASES[name] = seconds
+    logger.info('Startup phase "%s" took %.1f ms', name, seconds * 1000)
+
+
+@contextmanager
+def startup_phase(name: str) -> Iterator[None]:
+    """
+    Measures the wrapped block as a startup phase.
+
+    :param name: Human-readable name of the phase.
+    """
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        record_startup_phase(name, perf_counter() - started)
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+from datetime import timedelta
+
+from aiogram import Bot
+from aiogram.types import Update
+from aiogram.utils.backoff import Backoff, BackoffConfig
+
+from database.runtime_db_manager import runtime_get, runtime_set
+from utils.update_scheduler import UpdateScheduler
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_KEY = 'polling:offset'
+
+# Telegram picks a random update_id after a week without updates,
+# an older checkpoint would skip the new ones.
+CHECKPOINT_MAX_AGE = timedelta(days=7)
+
+
+class UpdatePoller:
+    """
+    Long polling loop that hands updates to an ``UpdateScheduler`` and checkpoints its offset.
+
+    Telegram forgets every update below the ``offset`` of a getUpdates
+    call, so the offset sent is the low-watermark of the updates: the
+    smallest update_id that is still being processed, or the next one to
+    come when nothing is in flight. Telegram returns the updates at and
+    above the watermark again, the ones already taken in are skipped.
+
+    A slow handler must not stop polling: when a fetch returns only
+    updates that were already taken in (the ``limit`` updates after the
+    slow one are done), the poller waits up to ``hold_timeout`` seconds
+    for progress and then polls past the updates it knows, acknowledging
+    the slow ones to Telegram while they are still being processed.
+
+    The offset is saved in the runtime state table after every fetch and
+    used as the first offset after a restart. Updates in flight at a crash
+    are fetched again unless they were acknowledged early. Processed
+    updates at or above the saved offset are delivered again too, they are
+    dropped by the duplicate update middleware.
+
+    Attributes:
+        bot (Bot): Bot instance the updates are fetched with.
+        scheduler (UpdateScheduler): Scheduler the updates are processed by.
+        allowed_updates (list[str]): Update types requested from Telegram.
+        timeout (int): Long polling timeout in seconds.
+        limit (int): Maximum number of updates fetched at once.
+        hold_timeout (float): Seconds in-flight updates may hold the offset when no new updates come in.
+    """
+
+    def __init__(
+            self,
+            bot: Bot,
+            scheduler: UpdateScheduler,
+            allowed_updates: list[str],
+            timeout: int = 30,
+            limit: int = 100,
+            hold_timeout: float = 10,
+    ):
+        """
+        Initializes the poller.
+
+        :param bot: Bot instance the updates are fetched with.
+        :param scheduler: Scheduler the updates are processed by.
+        :param allowed_updates: Update types requested from Telegram.
+        :param timeout: Long polling timeout in seconds.
+        :param limit: Maximum number of updates fetched at once.
+        :param hold_timeout: Seconds in-flight updates may hold the offset when no new updates come in.
+        """
+        self.bot = bot
+        self.scheduler = scheduler
+        self.allowed_updates = allowed_updates
+        self.timeout = timeout
+        self.limit = limit
+        self.hold_timeout = hold_timeout
+
+        self._in_flight: set[int] = set()
+        self._next: int | None = None
+        # Offset already sent past in-flight updates that held it too long.
+        self._acknowledged: int | None = None
+        self._saved: int | None = None
+        self._progress = asyncio.Event()
+        scheduler.on_processed = self._processed
+
+    @property
+    def watermark(self) -> int | None:
+        return min(self._in_flight, default=self._next)
+
+    @property
+    def offset(self) -> int | None:
+        """
+        The watermark of the updates that were not acknowledged early.
+        """
+        if self._acknowledged is None:
+            return self.watermark
+        held = (update_id for update_id in self._in_flight if update_id >= self._acknowledged)
+        return min(held, default=self._next)
+
+    def _processed(self, update: Update) -> None:
+        self._in_flight.discard(update.update_id)
+        self._progress.set()
+
+    async def load_checkpoint(self) -> None:
+        value = await runtime_get(CHECKPOINT_KEY, max_age=CHECKPOINT_MAX_AGE)
+        self._next = self._saved = int(value) if value is not None else None
+        logger.info('Polling from update id %s', self._next)
+
+    async def save_checkpoint(self) -> None:
+        offset = self.offset
+        if offset is not None and offset != self._saved:
+            await runtime_set(CHECKPOINT_KEY, str(offset))
+            self._saved = offset
+
+    async def run(self) -> None:
+        """
+        Fetches and schedules updates until cancelled.
+        """
+        await self.load_checkpoint()
+        backoff = Backoff(config=BackoffConfig(min_delay=1, max_delay=30, factor=2, jitter=0.1))
+        while True:
+            self._progress.clear()
+            try:
+                updates = await self.bot.get_updates(
+                    offset=self.offset,
+                    limit=self.limit,
+                    timeout=self.timeout,
+                    allowed_updates=self.allowed_updates,
+                    request_timeout=self.timeout + 30,
+                )
+            except Exception as exc:
+                logger.error('Failed to fetch updates - %s: %s', type(exc).__name__, exc)
+                await backoff.asleep()
+                continue
+            backoff.reset()
+
+            fresh = [
+                update for update in updates
+                if self._next is None or update.update_id >= self._next
+            ]
+            if updates and not fresh:
+                # Everything returned was taken in already, polling again
+                # right away would get the same updates back.
+                try:
+                    await asyncio.wait_for(self._progress.wait(), self.hold_timeout)
+                except asyncio.TimeoutError:
+                    logger.warning(
+                        'Update id=%d is still being processed, polling past update id=%d',
+                        min(self._in_flight), self._next - 1,
+                    )
+                    self._acknowledged = self._next
+                continue
+
+            for update in fresh:
+                self._in_flight.add(update.update_id)
+                self._next = update.update_id + 1
+                while not await self.scheduler.submit(update):
+                    logger.warning('Waiting for the update scheduler to accept update id=%d', update.update_id)
+            await self.save_checkpoint()
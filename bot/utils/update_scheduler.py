@@ -0,0 +1,245 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Callable, Hashable
+
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.middlewares.user_context import UserContextMiddleware
+from aiogram.methods import TelegramMethod
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+
+def update_order_key(update: Update | dict[str, Any]) -> Hashable:
+    """
+    Returns the key of the conversation an update belongs to.
+
+    Updates with the same key are processed one by one in the order they
+    were received: FSM states of the join flow depend on message order.
+    Updates without a chat or a user get a key of their own.
+
+    :param update: Parsed or raw update.
+    """
+    if isinstance(update, Update):
+        context = UserContextMiddleware.resolve_event_context(update)
+        chat_id = context.chat.id if context.chat else None
+        user_id = context.user.id if context.user else None
+        update_id = update.update_id
+    else:
+        chat_id = user_id = None
+        update_id = update.get('update_id')
+        for event_type, event in update.items():
+            if event_type == 'update_id' or not isinstance(event, dict):
+                continue
+            user = event.get('from') or event.get('user') or {}
+            chat = event.get('chat') or (event.get('message') or {}).get('chat') or {}
+            chat_id, user_id = chat.get('id'), user.get('id')
+            break
+
+    if chat_id is None and user_id is None:
+        return 'update', update_id
+    return chat_id, user_id
+
+
+class UpdateScheduler:
+    """
+    Processes updates in parallel across chats and strictly in order within a chat.
+
+    Every conversation (see ``update_order_key``) has its own FIFO queue
+    that exists only while it has pending updates. A fixed number of
+    workers take conversations with pending work from a ready queue, so a
+    conversation is handled by at most one worker at a time, and re-queue
+    it behind the others after each update so that a busy chat does not
+    starve the rest.
+
+    The total number of pending updates is bounded. When the limit is
+    reached, ``submit`` waits up to ``put_timeout`` seconds for a free
+    slot and then gives up, so the caller can ask Telegram to deliver the
+    update later.
+
+    Attributes:
+        dispatcher (Dispatcher): Dispatcher that processes the updates.
+        bot (Bot): Bot instance the updates are fed with.
+        workers (int): Number of worker tasks.
+        max_queue (int): Maximum number of pending updates.
+        put_timeout (float): Seconds to wait for a free slot before shedding an update.
+        on_processed (Callable | None): Called with every update once it is processed, failed or not.
+    """
+
+    def __init__(
+            self,
+            dispatcher: Dispatcher,
+            bot: Bot,
+            workers: int = 8,
+            max_queue: int = 1000,
+            put_timeout: float = 5,
+            **data: Any
+    ):
+        """
+        Initializes the scheduler, worker tasks are created by ``start``.
+
+        :param dispatcher: Dispatcher that processes the updates.
+        :param bot: Bot instance the updates are fed with.
+        :param workers: Number of worker tasks.
+        :param max_queue: Maximum number of pending updates.
+        :param put_timeout: Seconds to wait for a free slot before shedding an update.
+        :param data: Contextual data passed to the dispatcher.
+        """
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.workers = workers
+        self.max_queue = max_queue
+        self.put_timeout = put_timeout
+        self.data = data
+        self.on_processed: Callable[[Update | dict[str, Any]], None] | None = None
+
+        self._chats: dict[Hashable, deque[tuple[Update | dict[str, Any], float]]] = {}
+        self._ready: asyncio.Queue[Hashable] | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._pending = 0
+
+        self.accepted = 0
+        self.delayed = 0
+        self.shed = 0
+        self.processed = 0
+        self.failed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._pending
+
+    @property
+    def active_chats(self) -> int:
+        return len(self._chats)
+
+    def start(self) -> None:
+        """
+        Creates the worker tasks in the running event loop.
+        """
+        if self._tasks:
+            return
+        self._ready = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_queue)
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f'update-worker-{number}')
+            for number in range(self.workers)
+        ]
+
+    async def close(self, timeout: float = 10) -> None:
+        """
+        Waits for the pending updates to be processed and stops the workers.
+
+        :param timeout: Seconds to wait for the pending updates.
+        """
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._drained(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning('Dropping %d pending updates on shutdown', self._pending)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _drained(self) -> None:
+        while self._pending:
+            await asyncio.sleep(0.05)
+
+    async def submit(self, update: Update | dict[str, Any]) -> bool:
+        """
+        Queues an update behind the earlier updates of the same conversation.
+
+        :param update: Parsed or raw update received from Telegram.
+        :return: False if the update was shed because the scheduler stayed full.
+        """
+        if self._slots.locked():
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.put_timeout)
+            except asyncio.TimeoutError:
+                self.shed += 1
+                logger.warning(
+                    'Update scheduler is full (%d), update id=%s is shed',
+                    self.max_queue,
+                    update.update_id if isinstance(update, Update) else update.get('update_id'),
+                )
+                return False
+            self.delayed += 1
+        else:
+            await self._slots.acquire()
+
+        key = update_order_key(update)
+        item = (update, asyncio.get_running_loop().time())
+        self._pending += 1
+        self.accepted += 1
+        chat = self._chats.get(key)
+        if chat is None:
+            self._chats[key] = deque([item])
+            self._ready.put_nowait(key)
+        else:
+            chat.append(item)
+        return True
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            key = await self._ready.get()
+            chat = self._chats[key]
+            update, enqueued_at = chat.popleft()
+
+            wait = loop.time() - enqueued_at
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            try:
+                await self.process(update)
+            except Exception:
+                self.failed += 1
+                logger.exception(
+                    'Cause exception while process update id=%s',
+                    update.update_id if isinstance(update, Update) else update.get('update_id'),
+                )
+            finally:
+                self.processed += 1
+                self._pending -= 1
+                self._slots.release()
+                if self.on_processed is not None:
+                    self.on_processed(update)
+                if chat:
+                    self._ready.put_nowait(key)
+                else:
+                    del self._chats[key]
+
+    async def process(self, update: Update | dict[str, Any]) -> None:
+        """
+        Feeds one update to the dispatcher and executes a method returned by the handler.
+
+        :param update: Parsed or raw update received from Telegram.
+        """
+        if isinstance(update, Update):
+            result = await self.dispatcher.feed_update(bot=self.bot, update=update, **self.data)
+        else:
+            result = await self.dispatcher.feed_raw_update(bot=self.bot, update=update, **self.data)
+        if isinstance(result, TelegramMethod):
+            await self.dispatcher.silent_call_request(bot=self.bot, result=result)
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns the number of pending updates, counters and wait times in milliseconds.
+        """
+        return {
+            'queue_depth': self.queue_depth,
+            'max_queue': self.max_queue,
+            'active_chats': self.active_chats,
+            'workers': self.workers,
+            'accepted': self.accepted,
+            'delayed': self.delayed,
+            'shed': self.shed,
+            'processed': self.processed,
+            'failed': self.failed,
+            'avg_wait_ms': round(self.total_wait / self.processed * 1000, 1) if self.processed else 0.0,
+            'max_wait_ms': round(self.max_wait * 1000, 1),
+        }
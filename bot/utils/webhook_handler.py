@@ -0,0 +1,54 @@
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+from aiohttp import web
+
+from utils.update_scheduler import UpdateScheduler
+
+
+class QueuedRequestHandler(SimpleRequestHandler):
+    """
+    Webhook handler that acknowledges updates immediately and queues them into an ``UpdateScheduler``.
+
+    When the scheduler sheds an update the handler answers with 503, so Telegram
+    keeps the update and delivers it again later instead of the bot piling
+    up unbounded work.
+    """
+
+    def __init__(
+            self,
+            dispatcher: Dispatcher,
+            bot: Bot,
+            scheduler: UpdateScheduler,
+            secret_token: str | None = None,
+            **data: Any
+    ):
+        """
+        Initializes the handler.
+
+        :param dispatcher: Dispatcher that processes the updates.
+        :param bot: Bot instance the updates are fed with.
+        :param scheduler: Scheduler the updates are queued into.
+        :param secret_token: Expected X-Telegram-Bot-Api-Secret-Token header value.
+        """
+        super().__init__(
+            dispatcher=dispatcher,
+            bot=bot,
+            handle_in_background=True,
+            secret_token=secret_token,
+            **data
+        )
+        self.scheduler = scheduler
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        update = await request.json(loads=bot.session.json_loads)
+        if not await self.scheduler.submit(update):
+            return web.Response(status=503, text='Update queue is full')
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        """
+        Returns the scheduler statistics as JSON.
+        """
+        return web.json_response(self.scheduler.stats())